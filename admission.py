@@ -0,0 +1,155 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+
+# Work admitted at once per worker process, in cost units (about one page
+# each, see estimate()). 0 admits everything.
+ADMISSION_CAPACITY = float(os.environ.get("ADMISSION_CAPACITY", "200"))
+# Requests costing at most this many units go to the small lane...
+ADMISSION_SMALL_COST = float(os.environ.get("ADMISSION_SMALL_COST", "5"))
+# ...which always has this much of the capacity to itself, so small
+# requests never wait for large ones to finish.
+ADMISSION_SMALL_RESERVE = float(os.environ.get("ADMISSION_SMALL_RESERVE", "20"))
+# Longest a request waits for capacity, and how many may wait per lane,
+# before it is shed with 429.
+ADMISSION_WAIT_SECONDS = float(os.environ.get("ADMISSION_WAIT_SECONDS", "10"))
+ADMISSION_MAX_WAITING = int(os.environ.get("ADMISSION_MAX_WAITING", "32"))
+# Upload bytes counted as one page of work (images, fonts and embedded
+# files cost parse time too).
+ADMISSION_BYTES_PER_UNIT = int(os.environ.get("ADMISSION_BYTES_PER_UNIT", str(1024 * 1024)))
+
+LANES = ("small", "large")
+
+
+class Overloaded(Exception):
+    def __init__(self, lane, reason, retry_after):
+        super().__init__("server busy, retry later")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def estimate(pages, size):
+    """Cost of extracting ``pages`` pages from an upload of ``size`` bytes."""
+    return max(1.0, pages + size / ADMISSION_BYTES_PER_UNIT)
+
+
+class Ticket:
+    def __init__(self, controller, cost, lane):
+        self.controller = controller
+        self.cost = cost
+        self.lane = lane
+        self.started = time.monotonic()
+        self._event = threading.Event()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class Admission:
+    """Cost-based admission with a small and a large lane.
+
+    Each lane is served in arrival order. Large requests may use the
+    capacity minus the small lane's reserve; one large request is always
+    let in when no other is running, however big it is. Small requests may
+    use their reserve plus whatever capacity is free.
+    """
+
+    def __init__(self, capacity=ADMISSION_CAPACITY, small_cost=ADMISSION_SMALL_COST,
+                 small_reserve=ADMISSION_SMALL_RESERVE, wait_seconds=ADMISSION_WAIT_SECONDS,
+                 max_waiting=ADMISSION_MAX_WAITING):
+        self.capacity = capacity
+        self.small_cost = small_cost
+        self.small_reserve = min(small_reserve, capacity)
+        self.wait_seconds = wait_seconds
+        self.max_waiting = max_waiting
+        self._lock = threading.Lock()
+        self._in_flight = {lane: 0.0 for lane in LANES}
+        self._waiting = {lane: deque() for lane in LANES}
+        # Seconds per cost unit, smoothed, for Retry-After.
+        self._unit_seconds = 0.05
+
+    def lane(self, cost):
+        return "small" if cost <= self.small_cost else "large"
+
+    def _fits(self, cost, lane):
+        total = self._in_flight["small"] + self._in_flight["large"]
+        if lane == "small":
+            return self._in_flight["small"] + cost <= self.small_reserve or total + cost <= self.capacity
+        if self._in_flight["large"] == 0:
+            return True
+        return (self._in_flight["large"] + cost <= self.capacity - self.small_reserve
+                and total + cost <= self.capacity)
+
+    def _retry_after(self):
+        queued = sum(t.cost for lane in LANES for t in self._waiting[lane])
+        backlog = sum(self._in_flight.values()) + queued
+        return max(1, min(300, math.ceil(backlog * self._unit_seconds)))
+
+    def acquire(self, cost):
+        """Wait for room for ``cost`` and return a :class:`Ticket`; raises
+        :class:`Overloaded` if the lane's queue is full or the wait times
+        out. Call ``ticket.release()`` when the work is done."""
+        lane = self.lane(cost)
+        ticket = Ticket(self, cost, lane)
+        if self.capacity <= 0:
+            return ticket
+        with self._lock:
+            if not self._waiting[lane] and self._fits(cost, lane):
+                self._in_flight[lane] += cost
+                self._admitted(ticket, 0.0)
+                return ticket
+            if len(self._waiting[lane]) >= self.max_waiting:
+                self._shed(lane, "queue_full")
+            self._waiting[lane].append(ticket)
+        if ticket._event.wait(self.wait_seconds):
+            return ticket
+        with self._lock:
+            if ticket._event.is_set():
+                # Let in just as the wait ran out.
+                return ticket
+            self._waiting[lane].remove(ticket)
+            self._shed(lane, "timeout")
+
+    def _admitted(self, ticket, waited):
+        metrics.observe("admission_wait_seconds", waited, lane=ticket.lane)
+        ticket.started = time.monotonic()
+
+    def _shed(self, lane, reason):
+        metrics.inc("admission_shed_total", lane=lane, reason=reason)
+        raise Overloaded(lane, reason, self._retry_after())
+
+    def _release(self, ticket):
+        elapsed = time.monotonic() - ticket.started
+        with self._lock:
+            if self.capacity <= 0:
+                return
+            self._in_flight[ticket.lane] -= ticket.cost
+            self._unit_seconds = 0.9 * self._unit_seconds + 0.1 * elapsed / ticket.cost
+            # Small requests first, then large, each in arrival order.
+            for lane in LANES:
+                queue = self._waiting[lane]
+                while queue and self._fits(queue[0].cost, lane):
+                    waiter = queue.popleft()
+                    self._in_flight[lane] += waiter.cost
+                    self._admitted(waiter, time.monotonic() - waiter.started)
+                    waiter._event.set()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "small_reserve": self.small_reserve,
+                "in_flight": dict(self._in_flight),
+                "waiting": {lane: len(q) for lane, q in self._waiting.items()},
+            }
+
+
+controller = Admission()
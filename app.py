@@ -1,34 +1,239 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
 import io
+import math
 import os
-import tempfile
 import csv
-import pdfplumber
+import json
+import functools
+import threading
+import time
+import zipfile
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import admission
+import compression
+import metrics
+import profiling
+import warmup
+from artifacts import store as artifact_store
+from cache import make_key, result_cache
+from documents import layouts as layout_cache
+from documents import store as document_store
+from extraction import (
+    EXTRACT_MEMORY_LIMIT_MB,
+    EXTRACT_PROFILE,
+    PROFILES,
+    MemoryLimitExceeded,
+    extract_tables,
+    format_page_spec,
+    resolve_pages,
+    iter_extract_documents,
+    iter_extract_tables,
+    parse_page_spec,
+)
+from formats import TABLE_FORMATS, FormatUnavailable, check_available
+from jobs import JobQueue, QueueFull
+from rows import RowStore
+from uploads import (
+    UploadRejected,
+    UploadRequest,
+    body_limit,
+    check_pdf,
+    count_rejected,
+    open_upload,
+    rejected_stats,
+    upload_stats,
+)
 
 app = Flask(__name__)
-
-
-def extract_tables(path):
-    rows = []
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            try:
-                tables = page.extract_tables()
-            except Exception:
-                tables = None
-            if not tables:
-                continue
-            for tbl in tables:
-                if not tbl:
-                    continue
-                for r in tbl:
-                    rows.append([(cell if cell is not None else "") for cell in r])
-    return rows
+app.request_class = UploadRequest
+
+# Endpoints that profiling.py may profile.
+_PROFILED_ENDPOINTS = ("extract", "extract_batch")
+
+_in_flight_lock = threading.Lock()
+_in_flight = 0
+# Requests started in this process so far, to tell which ones overlapped.
+_started = 0
+
+
+@app.before_request
+def _start_request():
+    global _in_flight, _started
+    with _in_flight_lock:
+        _in_flight += 1
+        _started += 1
+        g.seq = _started
+        alone = _in_flight == 1
+    g.started = time.perf_counter()
+    g.timings = {}
+    # VmHWM is per process and gthread workers run several requests at
+    # once, so the peak is only reset, and reported, for a request that no
+    # other one overlapped.
+    g.rss_reset = alone and metrics.reset_peak_rss()
+    if request.endpoint in _PROFILED_ENDPOINTS:
+        g.profile_id = profiling.begin(request.endpoint, request.headers)
+
+
+@app.after_request
+def _finish_request(resp):
+    if "started" not in g:
+        return resp
+    elapsed = time.perf_counter() - g.started
+    endpoint = request.endpoint or "unknown"
+    metrics.inc("requests_total", endpoint=endpoint, status=resp.status_code)
+    metrics.observe("request_seconds", elapsed, endpoint=endpoint)
+    if endpoint == "extract":
+        # A streamed body is produced after this hook, so its timings only
+        # cover the work done before the first byte.
+        if g.rss_reset and _started == g.seq:
+            peak = metrics.peak_rss()
+            metrics.observe("request_peak_rss_bytes", peak, buckets=metrics.BYTES_BUCKETS)
+            resp.headers["X-Peak-RSS"] = str(peak)
+        g.timings["total"] = elapsed
+        resp.headers["Server-Timing"] = metrics.server_timing(g.timings)
+        if "admission" in g:
+            resp.headers["X-Admission-Lane"] = g.admission.lane
+    if g.get("profile_id"):
+        resp.headers["X-Profile-Id"] = g.profile_id
+    return resp
+
+
+@app.teardown_request
+def _end_request(exc):
+    global _in_flight
+    # A streamed response keeps its admission until the stream is closed,
+    # which is when Flask tears a stream_with_context request down.
+    ticket = g.pop("admission", None)
+    if ticket is not None:
+        ticket.release()
+    if "profile_id" in g:
+        profiling.end()
+    with _in_flight_lock:
+        _in_flight -= 1
+    metrics.flush()
+
+
+# Registered after the metrics hooks so it runs before them (Flask calls
+# after_request functions in reverse) and its time shows in Server-Timing.
+compression.init_app(app)
+
+
+metrics.describe("stage_seconds", "Time spent per /extract stage.")
+metrics.describe("page_seconds", "Table extraction time per page, by profile.")
+metrics.describe("request_seconds", "Time to produce a response, by endpoint.")
+metrics.describe(
+    "request_peak_rss_bytes", "Peak resident memory of the worker during an /extract request that ran alone in it."
+)
+metrics.describe("pages_processed_total", "Pages run through the table finder; rate() gives pages/sec.")
+metrics.describe("pages_skipped_total", "Pages skipped by the pre-scan.")
+metrics.describe("rows_extracted_total", "Rows extracted; rate() gives rows/sec.")
+metrics.describe("batch_files_total", "Files processed by /extract/batch, by outcome.")
+metrics.describe("ocr_pages_total", "Scanned pages read with OCR, by outcome (recognised, cached, error).")
+metrics.describe("pages_timed_out_total", "Pages given up on at the request deadline or the per-page timeout.")
+metrics.describe("memory_limit_aborts_total", "Extractions aborted for exceeding the memory limit.")
+metrics.describe("uploads_rejected_total", "Uploads refused before extraction, by reason.")
+metrics.describe("admission_wait_seconds", "Time /extract requests waited for capacity, by lane.")
+metrics.describe("admission_shed_total", "/extract requests refused with 429, by lane and reason.")
+
+
+@app.errorhandler(MemoryLimitExceeded)
+def _memory_limit_exceeded(e):
+    metrics.inc("memory_limit_aborts_total")
+    return jsonify({"error": str(e)}), 507
+
+
+@app.errorhandler(UploadRejected)
+def _upload_rejected(e):
+    return jsonify({"error": str(e), "reason": e.reason}), e.status
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def _upload_too_large(e):
+    # Raised by the form parser as soon as the body passes the limit, so
+    # the rest of an oversized upload is never read.
+    count_rejected("too_large")
+    limit = body_limit(request.endpoint)
+    return jsonify({"error": f"upload larger than {limit // 2**20} MB", "reason": "too_large"}), 413
+
+
+@app.errorhandler(admission.Overloaded)
+def _overloaded(e):
+    resp = jsonify({"error": str(e), "lane": e.lane, "reason": e.reason})
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp
+
+
+@app.errorhandler(FormatUnavailable)
+def _format_unavailable(e):
+    return jsonify({"error": str(e)}), 501
 
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"ok": True})
+    return jsonify({
+        "ok": True,
+        "ready": warmup.state["ready"],
+        "pid": os.getpid(),
+        "in_flight": _in_flight,
+        "jobs_pending": job_queue.pending,
+        "load": os.getloadavg(),
+    })
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    # /health says the process is up; /ready says it has been warmed up and
+    # should get traffic.
+    body = {"ready": warmup.state["ready"], "pid": os.getpid(), "warmup_seconds": warmup.state["seconds"]}
+    if warmup.state["error"]:
+        body["error"] = warmup.state["error"]
+    return jsonify(body), 200 if warmup.state["ready"] else 503
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/profiles", methods=["GET"])
+def profiles():
+    return jsonify({"default": EXTRACT_PROFILE, "profiles": PROFILES})
+
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(result_cache.snapshot())
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "cache": result_cache.snapshot(),
+        "uploads": dict(upload_stats),
+        "uploads_rejected": dict(rejected_stats),
+        "documents": document_store.snapshot(),
+        "layouts": layout_cache.snapshot(),
+        "admission": admission.controller.snapshot(),
+        "artifacts": artifact_store.snapshot(),
+    })
+
+
+def _collect_counters():
+    out = {f"cache_{name}_total": value for name, value in result_cache.stats.items()}
+    out.update({f"uploads_{kind}_total": value for kind, value in upload_stats.items()})
+    out["in_flight_requests"] = _in_flight
+    out["jobs_pending"] = job_queue.pending
+    queue = admission.controller.snapshot()
+    for lane in admission.LANES:
+        out[f"admission_in_flight_cost_{lane}"] = queue["in_flight"][lane]
+        out[f"admission_waiting_{lane}"] = queue["waiting"][lane]
+    return out
+
+
+metrics.register_collector(_collect_counters)
 
 
 @app.route("/", methods=["GET"])
@@ -355,7 +560,7 @@ def home():
                       </select>
                     </div>
                     <div style="text-align:right; font-size:11px; color:#9ca3af;">
-                      <div>Tables only · No OCR yet</div>
+                      <div>Tables only · OCR for scanned pages</div>
                       <div>Works best on digital PDFs</div>
                     </div>
                   </div>
@@ -412,7 +617,8 @@ def home():
             <div style="display:grid; grid-template-columns:repeat(auto-fit,minmax(260px,1fr)); gap:12px; font-size:12px;">
               <div style="border-radius:10px; padding:9px 11px; background:rgba(15,23,42,0.97); border:1px solid rgba(31,41,55,0.9);">
                 <strong>Health check</strong>
-                <pre>{ "method": "GET", "path": "/health" }</pre>
+                <pre>{ "method": "GET", "path": "/health" }
+{ "method": "GET", "path": "/ready" }  → 503 until warmed up</pre>
               </div>
               <div style="border-radius:10px; padding:9px 11px; background:rgba(15,23,42,0.97); border:1px solid rgba(31,41,55,0.9);">
                 <strong>Extract tables</strong>
@@ -420,7 +626,54 @@ def home():
 Content-Type: multipart/form-data
 
 file   → PDF file (required)
-output → "json" or "csv" (optional, default "csv")</pre>
+output → "json", "csv", "ndjson", "columnar", "arrow" or "parquet"
+         (optional, default "csv")
+stream → "1" to stream CSV page by page (ndjson always streams; others: 400)
+width  → streamed CSV row width: a number or "table" (default)
+pages  → page ranges, e.g. "1-5,40,90-" (optional, default all)
+profile → "fast-ruled", "text-aligned", "accurate" or "default"
+          (GET /profiles lists their table settings)
+prescan → "1" to skip pages without ruling lines before table finding,
+          "0" to turn off a profile's own pre-scan
+ocr → "0" to leave scanned (image-only) pages empty instead of running OCR
+dedupe → "1" to merge tables continued across pages under a repeated header,
+         dropping the repeats and page furniture ("tables" in JSON)
+low_memory → "1" to drop parsed PDF objects after every page
+memory_limit_mb → abort with 507 once the worker grows this much (capped by the server)
+deadline_seconds → time budget (or X-Deadline-Seconds header, capped by the
+          server); pages not reached are listed with "partial": true
+document → id from POST /documents, sent instead of file
+
+Refused before extraction: not a PDF → 415, password-protected or
+unreadable → 422, upload or page count over the server limit → 413;
+worker at capacity → 429 with Retry-After (small requests have their own lane)</pre>
+              </div>
+              <div style="border-radius:10px; padding:9px 11px; background:rgba(15,23,42,0.97); border:1px solid rgba(31,41,55,0.9);">
+                <strong>Same document, many extractions</strong>
+                <pre>POST   /documents        file → 201 { "id": ..., "pages": ... }
+POST   /extract          document=&lt;id&gt; plus the usual options;
+                         parsed pages are reused across calls
+DELETE /documents/&lt;id&gt;</pre>
+              </div>
+              <div style="border-radius:10px; padding:9px 11px; background:rgba(15,23,42,0.97); border:1px solid rgba(31,41,55,0.9);">
+                <strong>Stored results (servers with ARTIFACTS_DIR set)</strong>
+                <pre>POST /extract            → ETag and Content-Location: /results/&lt;id&gt;
+GET  /results/&lt;id&gt;        the same body; Range / If-Range to resume,
+                          If-None-Match → 304
+GET  /results/&lt;id&gt;?offset=0&amp;limit=1000
+                          → { "data": [...], "rows", "next" } (JSON rows)</pre>
+              </div>
+              <div style="border-radius:10px; padding:9px 11px; background:rgba(15,23,42,0.97); border:1px solid rgba(31,41,55,0.9);">
+                <strong>Large files: background jobs</strong>
+                <pre>POST /jobs              → 202 { "id": ... }
+GET  /jobs/&lt;id&gt;         → status, pages_done / pages_total
+GET  /jobs/&lt;id&gt;/result  → CSV or JSON once done</pre>
+              </div>
+              <div style="border-radius:10px; padding:9px 11px; background:rgba(15,23,42,0.97); border:1px solid rgba(31,41,55,0.9);">
+                <strong>Many files at once</strong>
+                <pre>POST /extract/batch
+files  → several PDFs, or one ZIP of PDFs
+output → "zip" (CSV per file + manifest) or "ndjson"</pre>
               </div>
             </div>
           </section>
@@ -596,49 +849,740 @@ output → "json" or "csv" (optional, default "csv")</pre>
     """
 
 
-@app.route("/extract", methods=["POST"])
-def extract():
-    if "file" not in request.files:
-        return jsonify({"error": "file is required"}), 400
+_CSV_HEADERS = {"Content-Disposition": "attachment; filename=extracted.csv"}
+_TRUE = ("1", "true", "yes")
+
+# Server-side cap (and default) for the time an /extract request may spend;
+# clients can ask for less. 0 means no deadline.
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "0"))
 
-    f = request.files["file"]
-    output = request.form.get("output", "csv")
 
-    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-        f.save(tmp.name)
-        pdf_path = tmp.name
+def _request_deadline():
+    """``time.monotonic()`` deadline for this request, or ``None``.
 
+    The budget comes from the ``X-Deadline-Seconds`` header or the
+    ``deadline_seconds`` form field and counts from the start of the request.
+    """
+    value = request.headers.get("X-Deadline-Seconds") or request.form.get("deadline_seconds", "")
+    budget = REQUEST_DEADLINE_SECONDS or None
+    if value.strip():
+        try:
+            asked = float(value)
+        except ValueError:
+            raise ValueError("deadline_seconds must be a number")
+        if not math.isfinite(asked) or asked <= 0:
+            raise ValueError("deadline_seconds must be positive")
+        budget = min(asked, budget) if budget else asked
+    if budget is None:
+        return None
+    return time.monotonic() + budget - (time.perf_counter() - g.started)
+
+
+def _partial_info(stats):
+    if not stats.get("partial"):
+        return {}
+    return {"partial": True, "timed_out_pages": stats["timed_out_pages"]}
+
+
+def _tables_info(stats):
+    # Logical tables found by the dedupe pass, with their row offsets into
+    # the flattened "data".
+    if "tables" not in stats:
+        return {}
+    return {"tables": stats["tables"]}
+
+
+def _dedupe_headers(stats):
+    if "tables" not in stats:
+        return {}
+    removed = sum(t["headers_removed"] + t["footers_removed"] for t in stats["tables"])
+    return {"X-Tables": str(len(stats["tables"])), "X-Rows-Removed": str(removed)}
+
+
+def _partial_headers(info):
+    if not info:
+        return {}
+    return {"X-Partial": "true", "X-Timed-Out-Pages": format_page_spec(info["timed_out_pages"])}
+
+
+def _parse_extract_options(form):
+    options = {}
+    spec = form.get("pages", "").strip()
+    if spec:
+        options["pages"] = parse_page_spec(spec)
+    profile = form.get("profile", "").strip()
+    if profile:
+        if profile not in PROFILES:
+            raise ValueError(f"profile must be one of {', '.join(PROFILES)}")
+        options["profile"] = profile
+    if form.get("dedupe", "").lower() in _TRUE:
+        options["dedupe"] = True
+    if form.get("ocr", "").lower() in ("0", "false", "no"):
+        options["use_ocr"] = False
+    prescan = form.get("prescan", "").lower()
+    if prescan in _TRUE:
+        options["prescan"] = True
+    elif prescan in ("0", "false", "no"):
+        # Lets a request turn off a profile's own pre-scan.
+        options["prescan"] = False
+    if form.get("low_memory", "").lower() in _TRUE:
+        options["low_memory"] = True
+    limit = form.get("memory_limit_mb", "").strip()
+    if limit:
+        try:
+            limit_mb = int(limit)
+        except ValueError:
+            raise ValueError("memory_limit_mb must be an integer")
+        if limit_mb < 1:
+            raise ValueError("memory_limit_mb must be positive")
+        # Clients may only tighten the server-wide ceiling, never lift it.
+        if EXTRACT_MEMORY_LIMIT_MB:
+            limit_mb = min(limit_mb, EXTRACT_MEMORY_LIMIT_MB)
+        options["memory_limit"] = limit_mb * 2**20
+    return options
+
+
+def _page_report(stats):
+    return {
+        "profile": stats["profile"],
+        "pages_total": stats["pages_in_document"],
+        "pages_processed": stats["pages_done"] - stats["pages_skipped"],
+        "pages_skipped": stats["pages_in_document"] - stats["pages_done"] + stats["pages_skipped"],
+        "prescan_saved_ms": stats["prescan_saved_ms"],
+        "pages_scanned": stats["pages_scanned"],
+        "pages_ocr": stats["pages_ocr"],
+    }
+
+
+def _page_report_headers(report):
+    return {
+        "X-Extract-Profile": report["profile"],
+        "X-Pages-Processed": str(report["pages_processed"]),
+        "X-Pages-Skipped": str(report["pages_skipped"]),
+        "X-Prescan-Saved-Ms": str(report["prescan_saved_ms"]),
+        "X-Pages-Scanned": str(report["pages_scanned"]),
+        "X-Pages-Ocr": str(report["pages_ocr"]),
+    }
+
+
+def _parse_width(value):
+    # Streaming cannot look ahead for the widest row, so CSV rows are padded
+    # either to a declared width or to the widest row of their own table.
+    if value in (None, "", "table"):
+        return None
     try:
-        rows = extract_tables(pdf_path)
-    finally:
+        width = int(value)
+    except ValueError:
+        raise ValueError("width must be an integer or \"table\"")
+    if width < 1:
+        raise ValueError("width must be positive")
+    return width
+
+
+def _stream_csv(source, width, options, deadline=None):
+    # CSV has no way to say the stream ended early: at the deadline, or at
+    # the memory limit once the first chunk is out, it just stops. Clients
+    # that need to know should stream ndjson.
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    sent = False
+    try:
+        for _, tables in iter_extract_tables(source, deadline=deadline, **options):
+            for tbl in tables:
+                cols = width or max(len(r) for r in tbl)
+                for r in tbl:
+                    writer.writerow(r + [""] * (cols - len(r)))
+            if buf.tell():
+                sent = True
+                yield buf.getvalue().encode("utf-8")
+                buf.seek(0)
+                buf.truncate()
+    except MemoryLimitExceeded:
+        if not sent:
+            raise
+        metrics.inc("memory_limit_aborts_total")
+
+
+def _primed(chunks):
+    # Run a stream up to its first chunk now, while an exception can still
+    # become an error response, and hand back an iterator over all of it.
+    first = next(chunks, None)
+
+    def body():
         try:
-            os.unlink(pdf_path)
-        except Exception:
-            pass
+            if first is not None:
+                yield first
+            yield from chunks
+        finally:
+            chunks.close()
+
+    return body()
+
+
+def _logical_table(tables, current, row):
+    # The dedupe table that output row ``row`` belongs to. Tables are
+    # numbered in output order; one whose rows were all removed has no
+    # first_row and is never current.
+    for index in range(current + 1, len(tables)):
+        first = tables[index]["first_row"]
+        if first is None:
+            continue
+        if first > row:
+            break
+        current = index
+    return current
+
+
+def _stream_ndjson(source, options, deadline=None):
+    # "table" numbers the tables of the whole document; with dedupe, rows
+    # of a table continued across pages keep its number, the same one as
+    # in the closing "tables" record.
+    stats = {}
+    table = -1
+    emitted = 0
+    try:
+        for page_number, tables in iter_extract_tables(source, stats=stats, deadline=deadline, **options):
+            lines = []
+            for tbl in tables:
+                if "tables" in stats:
+                    table = _logical_table(stats["tables"], table, emitted)
+                else:
+                    table += 1
+                emitted += len(tbl)
+                for r in tbl:
+                    lines.append(json.dumps({"page": page_number, "table": table, "row": r}))
+            if lines:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+        partial = _partial_info(stats)
+        if partial:
+            yield (json.dumps(partial) + "\n").encode("utf-8")
+        if "tables" in stats:
+            yield (json.dumps(_tables_info(stats)) + "\n").encode("utf-8")
+    except MemoryLimitExceeded as e:
+        # Headers are long gone; tell the client in-band why the stream ends.
+        metrics.inc("memory_limit_aborts_total")
+        yield (json.dumps({"error": str(e)}) + "\n").encode("utf-8")
+
+
+def _streaming_response(source, output, width, options, deadline=None):
+    # stream_with_context keeps the request, and so the upload, open until
+    # the last chunk has been produced.
+    if output == "ndjson":
+        return Response(
+            stream_with_context(_stream_ndjson(source, options, deadline)),
+            mimetype="application/x-ndjson",
+        )
+    return Response(
+        stream_with_context(_primed(_stream_csv(source, width, options, deadline))),
+        mimetype="text/csv",
+        headers=_CSV_HEADERS,
+    )
 
+
+def _csv_bytes(rows, timings=None):
+    # rows is a RowStore: it knows its width, so rows are padded as they
+    # are written rather than in a normalized copy.
+    if not rows:
+        return b""
+    with metrics.timed("serialize", timings):
+        return rows.csv_bytes()
+
+
+def _cacheable_headers(resp):
+    return {k: v for k, v in resp.headers.items() if k == "Content-Disposition"}
+
+
+def _table_response(tables, output, timings=None):
+    render, mimetype, filename = TABLE_FORMATS[output]
+    with metrics.timed("serialize", timings):
+        body = render(tables)
+    headers = {"Content-Disposition": f"attachment; filename={filename}"} if filename else {}
+    return Response(body, mimetype=mimetype, headers=headers)
+
+
+def _render_tables(source, output, stats, options, timings=None, deadline=None):
+    tables = []
+    n_rows = 0
+    with metrics.timed("extract", timings):
+        for page_number, page_tables in iter_extract_tables(source, stats=stats, deadline=deadline, **options):
+            for index, tbl in enumerate(page_tables):
+                tables.append((page_number, index, tbl))
+                n_rows += len(tbl)
+    metrics.inc("rows_extracted_total", n_rows)
+    return _table_response(tables, output, timings)
+
+
+def _render_rows(rows, output, report=None, timings=None, info=None):
+    extra = {"pages": report} if report else {}
+    extra.update(info or {})
     if not rows:
         if output == "json":
-            return jsonify({"rows": 0, "data": []})
+            return jsonify({"rows": 0, "data": [], **extra})
         else:
-            return jsonify({"rows": 0, "message": "no tables found"})
+            return jsonify({"rows": 0, "message": "no tables found", **extra})
 
     if output == "json":
-        return jsonify({"rows": len(rows), "data": rows})
+        with metrics.timed("serialize", timings):
+            return Response(rows.json_bytes(rows=len(rows), **extra), mimetype="application/json")
     else:
-        max_cols = max(len(r) for r in rows)
-        normalized = [r + [""] * (max_cols - len(r)) for r in rows]
-
-        csv_buf = io.StringIO()
-        writer = csv.writer(csv_buf)
-        writer.writerows(normalized)
-
-        mem = io.BytesIO(csv_buf.getvalue().encode("utf-8"))
-        return send_file(
-            mem,
-            as_attachment=True,
-            download_name="extracted.csv",
-            mimetype="text/csv"
-        )
+        return Response(_csv_bytes(rows, timings), mimetype="text/csv", headers=_CSV_HEADERS)
+
+
+@app.route("/documents", methods=["POST"])
+def upload_document():
+    # Upload once, extract many times: /extract with document=<id> reads
+    # the stored file and reuses its parsed page layouts.
+    if "file" not in request.files:
+        return jsonify({"error": "file is required"}), 400
+    f = request.files["file"]
+    pages = check_pdf(f.stream)
+    source, _, digest = open_upload(f)
+    size = document_store.put(digest, source)
+    return jsonify({"id": digest, "pages": pages, "bytes": size}), 201
+
+
+@app.route("/documents/<doc_id>", methods=["DELETE"])
+def delete_document(doc_id):
+    if not document_store.delete(doc_id):
+        return jsonify({"error": "unknown document"}), 404
+    return "", 204
+
+
+def _artifact_headers(key):
+    # The result key covers the upload's hash and every option, so it is a
+    # stable strong ETag for the result.
+    if artifact_store.get(key) is None:
+        return {}
+    return {"ETag": f'"{key}"', "Content-Location": f"/results/{key}", "X-Result-Id": key}
+
+
+RESULT_PAGE_MAX_ROWS = int(os.environ.get("RESULT_PAGE_MAX_ROWS", "10000"))
+
+
+def _int_arg(name, default, low, high):
+    value = request.args.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if not low <= number <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return number
+
+
+def _result_page(key, meta):
+    try:
+        offset = _int_arg("offset", 0, 0, 2**62)
+        limit = _int_arg("limit", 1000, 1, RESULT_PAGE_MAX_ROWS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if "rows" not in meta:
+        return jsonify({"error": "this result has no rows to page through"}), 400
+    data = artifact_store.rows(key, offset, limit)
+    if data is None:
+        return jsonify({"error": "result not found"}), 404
+    total = meta["rows"]
+    fields = {"rows": total, "offset": offset, "limit": limit, "next": None}
+    if offset + limit < total:
+        fields["next"] = f"/results/{key}?offset={offset + limit}&limit={limit}"
+    rest = json.dumps(fields, sort_keys=True, separators=(",", ":"))
+    resp = Response(b'{"data":' + data + b"," + rest[1:].encode("ascii") + b"\n", mimetype="application/json")
+    resp.set_etag(f"{key}-{offset}-{limit}")
+    return resp.make_conditional(request)
+
+
+@app.route("/results/<key>", methods=["GET"])
+@compression.identity_ranges
+def result(key):
+    """A stored /extract result: the whole body with Range/If-Range
+    support, or with offset/limit a page of its rows as JSON."""
+    meta = artifact_store.get(key)
+    if meta is None:
+        return jsonify({"error": "result not found"}), 404
+    if "offset" in request.args or "limit" in request.args:
+        return _result_page(key, meta)
+    headers = dict(meta["headers"])
+    disposition = headers.pop("Content-Disposition", "")
+    download_name = disposition.partition("filename=")[2] or None
+    resp = send_file(
+        meta["path"],
+        mimetype=meta["mimetype"],
+        as_attachment=download_name is not None,
+        download_name=download_name,
+        conditional=True,
+        etag=key,
+    )
+    if download_name is None:
+        # send_file names it after the file on disk; the original had no name.
+        del resp.headers["Content-Disposition"]
+    resp.headers.update(headers)
+    return resp
+
+
+def _stream_size(stream):
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+def _admit(cost):
+    # Waits for room in this worker (small requests have a lane of their
+    # own) or raises Overloaded; released in _end_request.
+    with metrics.timed("queue", g.timings):
+        g.admission = admission.controller.acquire(cost)
+
+
+@app.route("/extract", methods=["POST"])
+def extract():
+    document_id = request.form.get("document", "").strip()
+    if "file" not in request.files and not document_id:
+        return jsonify({"error": "file or document is required"}), 400
+
+    output = request.form.get("output", "csv")
+    stream = output == "ndjson" or request.form.get("stream", "").lower() in _TRUE
+
+    try:
+        options = _parse_extract_options(request.form)
+        deadline = _request_deadline()
+        if stream:
+            if output not in ("csv", "ndjson"):
+                raise ValueError("stream=1 needs output csv or ndjson")
+            width = _parse_width(request.form.get("width"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    check_available(output)
+
+    if document_id:
+        source = document_store.path(document_id)
+        if source is None:
+            return jsonify({"error": "unknown document"}), 404
+        upload_kind, digest = "document", document_id
+        options["layout_key"] = document_id
+        with open(source, "rb") as fh:
+            n_pages = check_pdf(fh)
+        size = os.path.getsize(source)
+    else:
+        f = request.files["file"]
+        with metrics.timed("validate", g.timings):
+            n_pages = check_pdf(f.stream)
+        with metrics.timed("upload", g.timings):
+            source, upload_kind, digest = open_upload(f)
+        size = _stream_size(source)
+    if "pages" in options:
+        n_pages = len(resolve_pages(options["pages"], n_pages))
+    cost = admission.estimate(n_pages, size)
+
+    if stream:
+        _admit(cost)
+        resp = _streaming_response(source, output, width, options, deadline)
+        resp.headers["X-Upload-Path"] = upload_kind
+        return resp
+
+    # The server default profile is part of the key, so changing it does not
+    # serve results found with the old one.
+    # layout_key only says where parsed pages may be cached; the result
+    # is the same as for the uploaded file.
+    key_options = {k: v for k, v in options.items() if k != "layout_key"}
+    key = make_key(digest, output=output, **{"profile": EXTRACT_PROFILE, **key_options})
+    cached = result_cache.get(key)
+    if cached is not None:
+        body, mimetype, headers = cached
+        resp = Response(body, mimetype=mimetype, headers=headers)
+        resp.headers.update(_artifact_headers(key))
+        resp.headers["X-Cache"] = "HIT"
+        resp.headers["X-Upload-Path"] = upload_kind
+        return resp
+
+    _admit(cost)
+    stats = {}
+    report = None
+    rows = None
+    if output in TABLE_FORMATS:
+        resp = _render_tables(source, output, stats, options, g.timings, deadline)
+    else:
+        with metrics.timed("extract", g.timings):
+            rows = extract_tables(source, stats=stats, deadline=deadline, **options)
+        metrics.inc("rows_extracted_total", len(rows))
+        report = _page_report(stats) if options else None
+        resp = _render_rows(rows, output, report, g.timings, {**_partial_info(stats), **_tables_info(stats)})
+    g.timings["open"] = stats["open_seconds"]
+
+    report = report or (_page_report(stats) if options else None)
+    headers = _cacheable_headers(resp)
+    if report:
+        headers.update(_page_report_headers(report))
+    partial = _partial_info(stats)
+    headers.update(_partial_headers(partial))
+    headers.update(_dedupe_headers(stats))
+    resp.headers.update(headers)
+    # A partial result depends on how busy the box was; never replay it.
+    if not partial:
+        result_cache.put(key, resp.get_data(), resp.mimetype, headers)
+        with metrics.timed("store", g.timings):
+            artifact_store.put(key, resp.get_data(), resp.mimetype, headers, rows)
+        resp.headers.update(_artifact_headers(key))
+    resp.headers["X-Cache"] = "MISS"
+    resp.headers["X-Upload-Path"] = upload_kind
+    return resp
+
+
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "1000"))
+
+
+class _ChunkSink:
+    # Write-only file object for zipfile; it falls back to data descriptors
+    # when the target cannot seek, which is what lets the archive stream.
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _is_zip(storage):
+    head = storage.stream.read(4)
+    storage.stream.seek(0)
+    return head == b"PK\x03\x04"
+
+
+def _storage_source(storage):
+    stream = storage.stream
+    name = getattr(stream, "name", None)
+    if isinstance(name, str) and os.path.exists(name):
+        # Spooled to disk already: pool workers can read it by path.
+        stream.flush()
+        return name
+    stream.seek(0)
+    return stream.read()
+
+
+def _member_source(archive, info):
+    # The ZIP directory gives the size up front; nothing is inflated for a
+    # member that is over the single-upload limit.
+    limit = body_limit("extract")
+    if limit and info.file_size > limit:
+        count_rejected("too_large")
+        raise UploadRejected("too_large", f"larger than {limit // 2**20} MB", 413)
+    return archive.read(info)
+
+
+def _checked_source(load):
+    # Runs as each file is handed to the pool; a rejected file becomes that
+    # file's error and the rest of the batch carries on.
+    source = load()
+    if isinstance(source, str):
+        with open(source, "rb") as fh:
+            check_pdf(fh)
+    else:
+        check_pdf(io.BytesIO(source))
+    return source
+
+
+def _batch_inputs(files):
+    inputs = []
+    for storage in files:
+        if _is_zip(storage):
+            archive = zipfile.ZipFile(storage.stream)
+            for info in archive.infolist():
+                if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                    continue
+                if not info.filename.lower().endswith(".pdf"):
+                    continue
+                load = functools.partial(_member_source, archive, info)
+                inputs.append((info.filename, functools.partial(_checked_source, load)))
+        else:
+            name = storage.filename or f"file{len(inputs) + 1}.pdf"
+            load = functools.partial(_storage_source, storage)
+            inputs.append((name, functools.partial(_checked_source, load)))
+    return inputs
+
+
+def _iter_batch(inputs, options):
+    remaining = set(range(len(inputs)))
+    try:
+        for index, rows, error in iter_extract_documents([load for _, load in inputs], **options):
+            remaining.discard(index)
+            metrics.inc("batch_files_total", status="error" if error else "ok")
+            yield index, rows, error
+    except Exception as e:
+        # The pool broke: every file that did not finish gets the error.
+        for index in sorted(remaining):
+            metrics.inc("batch_files_total", status="error")
+            yield index, None, e
+
+
+def _batch_ndjson(inputs, options):
+    for index, rows, error in _iter_batch(inputs, options):
+        record = {"index": index, "file": inputs[index][0]}
+        if error is not None:
+            record["error"] = str(error) or error.__class__.__name__
+            yield (json.dumps(record) + "\n").encode("utf-8")
+        else:
+            yield rows.json_bytes(rows=len(rows), **record)
+
+
+def _batch_zip(inputs, options):
+    sink = _ChunkSink()
+    manifest = []
+    used = set()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for index, rows, error in _iter_batch(inputs, options):
+            name = inputs[index][0]
+            entry = {"index": index, "file": name}
+            if error is not None:
+                entry["error"] = str(error) or error.__class__.__name__
+            else:
+                stem = os.path.splitext(os.path.basename(name))[0] or f"file{index + 1}"
+                member = f"{stem}.csv"
+                if member in used:
+                    member = f"{stem}-{index + 1}.csv"
+                used.add(member)
+                archive.writestr(member, _csv_bytes(rows))
+                entry["rows"] = len(rows)
+                entry["csv"] = member
+            manifest.append(entry)
+            yield sink.drain()
+        manifest.sort(key=lambda e: e["index"])
+        archive.writestr("manifest.json", json.dumps({"files": manifest}, indent=2))
+    yield sink.drain()
+
+
+@app.route("/extract/batch", methods=["POST"])
+def extract_batch():
+    files = request.files.getlist("files") + request.files.getlist("file")
+    if not files:
+        return jsonify({"error": "files are required"}), 400
+
+    output = request.form.get("output", "zip")
+    if output not in ("zip", "ndjson"):
+        return jsonify({"error": "output must be \"zip\" or \"ndjson\""}), 400
+    try:
+        options = _parse_extract_options(request.form)
+        inputs = _batch_inputs(files)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except zipfile.BadZipFile:
+        return jsonify({"error": "invalid zip archive"}), 400
+
+    if not inputs:
+        return jsonify({"error": "no PDF files found"}), 400
+    if len(inputs) > BATCH_MAX_FILES:
+        return jsonify({"error": f"at most {BATCH_MAX_FILES} files per batch"}), 413
+
+    if output == "ndjson":
+        return Response(stream_with_context(_batch_ndjson(inputs, options)), mimetype="application/x-ndjson")
+    return Response(
+        stream_with_context(_batch_zip(inputs, options)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=extracted.zip"},
+    )
+
+
+def _run_job(pdf_path, options, progress):
+    output = options["output"]
+    extract_options = options["extract"]
+    stats = {}
+    tables = []
+    for page_number, page_tables in iter_extract_tables(pdf_path, stats=stats, **extract_options):
+        for index, tbl in enumerate(page_tables):
+            tables.append((page_number, index, tbl))
+        progress(stats["pages_done"], stats["pages_total"])
+
+    report = _page_report(stats) if extract_options else None
+    partial = _partial_info(stats)
+    with app.app_context():
+        if output in TABLE_FORMATS:
+            resp = _table_response(tables, output)
+        else:
+            rows = RowStore(r for _, _, tbl in tables for r in tbl)
+            resp = _render_rows(rows, output, report, info={**partial, **_tables_info(stats)})
+    headers = _cacheable_headers(resp)
+    if report:
+        headers.update(_page_report_headers(report))
+    headers.update(_partial_headers(partial))
+    headers.update(_dedupe_headers(stats))
+    return resp.get_data(), resp.mimetype, headers
+
+
+job_queue = JobQueue(_run_job)
+
+
+def execute_job(job_id, input_path, status):
+    """Run a queued job in this process; asgi.py sends jobs here in its
+    extraction processes."""
+    job_queue.execute(job_id, input_path, status)
+
+
+def _job_urls(job_id):
+    return {"status_url": f"/jobs/{job_id}", "result_url": f"/jobs/{job_id}/result"}
+
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    if "file" not in request.files:
+        return jsonify({"error": "file is required"}), 400
+
+    f = request.files["file"]
+    output = request.form.get("output", "csv")
+    try:
+        extract_options = _parse_extract_options(request.form)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    check_available(output)
+    check_pdf(f.stream)
+
+    try:
+        status = job_queue.submit(f.save, {"output": output, "extract": extract_options})
+    except QueueFull:
+        resp = jsonify({"error": "too many pending jobs, retry later"})
+        resp.status_code = 429
+        resp.headers["Retry-After"] = "30"
+        return resp
+
+    resp = jsonify({"id": status["id"], "status": status["status"], **_job_urls(status["id"])})
+    resp.status_code = 202
+    resp.headers["Location"] = f"/jobs/{status['id']}"
+    return resp
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify({
+        "id": status["id"],
+        "status": status["status"],
+        "pages_done": status["pages_done"],
+        "pages_total": status["pages_total"],
+        "error": status["error"],
+        **_job_urls(job_id),
+    })
+
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "job not found"}), 404
+    if status["status"] != "done":
+        return jsonify({"error": "job is not finished", "status": status["status"]}), 409
+    return send_file(job_queue.result_path(job_id), mimetype=status["mimetype"]), 200, status["headers"]
+
+
+warmup.start()
 
 
 if __name__ == "__main__":
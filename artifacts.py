@@ -0,0 +1,113 @@
+import json
+import os
+import re
+import time
+from array import array
+
+import disk
+
+# Finished /extract results, one set of files per result key, shared by
+# every worker on the box; the least recently used are pruned past
+# ARTIFACTS_MAX_BYTES. Empty (the default) leaves results unstored.
+ARTIFACTS_DIR = os.environ.get("ARTIFACTS_DIR", "")
+ARTIFACTS_MAX_BYTES = int(os.environ.get("ARTIFACTS_MAX_BYTES", str(4 * 1024 * 1024 * 1024)))
+
+# Prune the directory every this many new artifacts rather than on each one.
+_PRUNE_EVERY = 32
+
+# An artifact's files, in the order they are deleted: metadata first, so a
+# reader never sees a half-deleted artifact.
+_SUFFIXES = (".json", ".body", ".rows", ".index")
+
+_ID = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ArtifactStore:
+    """Result bodies addressed by their result cache key.
+
+    ``<key>.body`` is the response as sent; for row outputs ``<key>.rows``
+    holds one JSON array per row and ``<key>.index`` the byte offset of
+    every row in it, so any range of rows is one seek and one read.
+    ``<key>.json`` (written last) says the artifact is complete.
+    """
+
+    def __init__(self, directory=ARTIFACTS_DIR, max_bytes=ARTIFACTS_MAX_BYTES):
+        self.directory = directory or None
+        self.max_bytes = max_bytes
+        if self.directory:
+            self._disk = disk.LRUDirectory(
+                self.directory, max_bytes=max_bytes, suffixes=_SUFFIXES, prune_every=_PRUNE_EVERY,
+            )
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key + ext)
+
+    def put(self, key, body, mimetype, headers, rows=None):
+        """Store a result; ``rows`` (a RowStore) enables row paging."""
+        if not self.directory or os.path.exists(self._path(key, ".json")):
+            return
+        meta = {"mimetype": mimetype, "headers": dict(headers), "bytes": len(body), "created": time.time()}
+        try:
+            disk.write_atomic(self._path(key, ".body"), body)
+            if rows is not None:
+                offsets = array("q", [0])
+
+                def lines():
+                    for row in rows.json_rows():
+                        offsets.append(offsets[-1] + len(row) + 1)
+                        yield row + b"\n"
+
+                disk.write_atomic(self._path(key, ".rows"), lines())
+                disk.write_atomic(self._path(key, ".index"), offsets.tobytes())
+                meta["rows"] = len(rows)
+            disk.write_atomic(self._path(key, ".json"), json.dumps(meta).encode("utf-8"))
+        except OSError:
+            return
+        self._disk.added()
+
+    def get(self, key):
+        """The artifact's metadata plus ``path`` of its body, or None."""
+        if not self.directory or not _ID.match(key or ""):
+            return None
+        meta_path = self._path(key, ".json")
+        try:
+            with open(meta_path) as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        disk.touch(meta_path)
+        meta["path"] = self._path(key, ".body")
+        return meta
+
+    def rows(self, key, offset, limit):
+        """Rows ``offset`` to ``offset + limit`` as the bytes of a JSON
+        array, read straight from the rows file."""
+        width = array("q").itemsize
+        try:
+            with open(self._path(key, ".index"), "rb") as fh:
+                total = os.fstat(fh.fileno()).st_size // width - 1
+                offset = min(offset, total)
+                stop = min(offset + limit, total)
+                fh.seek(offset * width)
+                bounds = array("q")
+                bounds.frombytes(fh.read((stop - offset + 1) * width))
+            with open(self._path(key, ".rows"), "rb") as fh:
+                fh.seek(bounds[0])
+                data = fh.read(bounds[-1] - bounds[0])
+        except (OSError, IndexError):
+            return None
+        return b"[" + b",".join(data.splitlines()) + b"]"
+
+    def snapshot(self):
+        count = size = 0
+        if self.directory:
+            try:
+                for entry in os.scandir(self.directory):
+                    count += entry.name.endswith(".json")
+                    size += entry.stat().st_size
+            except OSError:
+                pass
+        return {"results": count, "bytes": size, "max_bytes": self.max_bytes, "dir": self.directory}
+
+
+store = ArtifactStore()
@@ -0,0 +1,368 @@
+"""ASGI entry point: ``uvicorn asgi:app``.
+
+Uploads are received and responses sent on the event loop, so slow clients
+only cost a socket and a buffer. The Flask routes themselves run unchanged:
+``POST /extract``, ``/extract/batch`` and background jobs in a bounded pool
+of processes (each one a warmed-up copy of the app handling one request at
+a time), and everything else in a small thread pool in this process.
+
+Responses come back to the event loop over a Unix socket as they are
+produced, so streamed routes stay streamed and a large body is never held
+whole on either side.
+"""
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import extraction
+import metrics
+from app import app as flask_app
+from app import execute_job, job_queue
+from uploads import UPLOAD_SPOOL_BYTES, SpooledUpload, body_limit, count_rejected
+
+# Extraction processes; together they should keep every core busy.
+ASGI_PROCESSES = int(os.environ.get("ASGI_PROCESSES", str(os.cpu_count() or 1)))
+# Threads for the cheap routes (/, /health, /metrics, /jobs, ...).
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", "8"))
+# Response bodies are sent in chunks of this size.
+ASGI_SEND_CHUNK = 64 * 1024
+
+_PROCESS_ROUTES = {("POST", "/extract"), ("POST", "/extract/batch")}
+
+_processes = None
+_processes_lock = threading.Lock()
+_threads = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="asgi")
+
+# (path, server task) of the socket responses are sent back on, and the
+# requests waiting for their worker to connect to it, by token.
+_reply = None
+_waiting = {}
+
+
+def _init_process():
+    # The pool is the parallelism here; a nested extraction pool per
+    # process would oversubscribe the cores.
+    extraction.EXTRACT_WORKERS = 1
+
+
+def _get_processes():
+    global _processes
+    with _processes_lock:
+        if _processes is None:
+            _processes = ProcessPoolExecutor(
+                max_workers=ASGI_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process,
+            )
+        return _processes
+
+
+def _shutdown_processes(broken=None):
+    # With ``broken``, only if that pool is still the current one: every
+    # request it was running reports it, and a new pool may be up by then.
+    global _processes
+    with _processes_lock:
+        if broken is not None and _processes is not broken:
+            return
+        if _processes is not None:
+            _processes.shutdown(wait=False, cancel_futures=True)
+        _processes = None
+
+
+def _offload_job(job_id, input_path, status):
+    # Runs in a job thread: extraction for jobs is as CPU-bound as for
+    # /extract, so it goes to the same processes, not next to the event loop.
+    pool = _get_processes()
+    try:
+        pool.submit(execute_job, job_id, input_path, status).result()
+    except BrokenProcessPool:
+        _shutdown_processes(pool)
+        raise
+
+
+job_queue.offload = _offload_job
+
+
+def _environ(scope, content_length):
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        "CONTENT_LENGTH": str(content_length),
+    }
+    server = scope.get("server") or ("localhost", 80)
+    environ["SERVER_NAME"], environ["SERVER_PORT"] = server[0], str(server[1])
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = "HTTP_" + name
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _send_frame(sock, data):
+    sock.sendall(len(data).to_bytes(8, "big"))
+    if data:
+        sock.sendall(data)
+
+
+def _call_wsgi(environ, body, reply_path, token):
+    """Run one request through the Flask app, streaming the response back
+    over the reply socket: a JSON frame with status and headers, the body
+    in frames of at most ``ASGI_SEND_CHUNK`` bytes, then an empty frame.
+
+    ``body`` is the request body as bytes or the path of a file holding it.
+    Runs in a pool process for the extraction routes, in a thread otherwise.
+    """
+    stream = open(body, "rb") if isinstance(body, str) else io.BytesIO(body)
+    environ = dict(environ, **{"wsgi.input": stream, "wsgi.errors": sys.stderr})
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = headers
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(reply_path)
+        sock.sendall(token.encode("ascii") + b"\n")
+        result = flask_app(environ, start_response)
+        try:
+            _send_frame(sock, json.dumps(response).encode("utf-8"))
+            for chunk in result:
+                view = memoryview(chunk)
+                for start in range(0, len(view), ASGI_SEND_CHUNK):
+                    _send_frame(sock, view[start:start + ASGI_SEND_CHUNK])
+            _send_frame(sock, b"")
+        except OSError:
+            # The event loop stopped reading: the client is gone.
+            pass
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+    finally:
+        sock.close()
+        stream.close()
+
+
+async def _on_reply(reader, writer):
+    try:
+        token = (await reader.readline()).decode("ascii").strip()
+    except (OSError, UnicodeDecodeError):
+        token = ""
+    connected = _waiting.pop(token, None)
+    if connected is None or connected.done():
+        writer.close()
+        return
+    connected.set_result((reader, writer))
+
+
+async def _reply_socket():
+    global _reply
+    if _reply is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="pdf2csvhub-asgi-"), "reply.sock")
+        _reply = (path, asyncio.ensure_future(asyncio.start_unix_server(_on_reply, path)))
+    path, server = _reply
+    await server
+    return path
+
+
+def _close_reply_socket():
+    global _reply
+    if _reply is not None:
+        path, server = _reply
+        if server.done() and not server.exception():
+            server.result().close()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    _reply = None
+
+
+async def _read_frame(reader):
+    size = int.from_bytes(await reader.readexactly(8), "big")
+    return await reader.readexactly(size) if size else b""
+
+
+async def _relay(executor, environ, body, send):
+    # Run the request in ``executor`` and forward its response frames to
+    # the client as they arrive.
+    loop = asyncio.get_running_loop()
+    reply_path = await _reply_socket()
+    token = uuid.uuid4().hex
+    connected = loop.create_future()
+    _waiting[token] = connected
+    task = loop.run_in_executor(executor, _call_wsgi, environ, body, reply_path, token)
+    writer = None
+    started = False
+    try:
+        await asyncio.wait({connected, task}, return_when=asyncio.FIRST_COMPLETED)
+        if not connected.done():
+            if task.cancelled():
+                raise ConnectionError("request cancelled")
+            task.result()
+            # It finished before its connection was accepted; the whole
+            # response is waiting in the socket.
+            await connected
+        reader, writer = connected.result()
+        head = json.loads(await _read_frame(reader))
+        await send({
+            "type": "http.response.start",
+            "status": head["status"],
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in head["headers"]],
+        })
+        started = True
+        while True:
+            chunk = await _read_frame(reader)
+            if not chunk:
+                break
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+    except (BrokenProcessPool, EOFError, OSError):
+        if not started:
+            await _send_response(send, 503, [("Content-Type", "application/json")], b'{"error":"worker crashed"}\n')
+        # Otherwise the body is cut short and the client sees it.
+    finally:
+        _waiting.pop(token, None)
+        if writer is not None:
+            # A worker still sending gets EPIPE and stops.
+            writer.close()
+        # The worker may still be reading the request body, which the
+        # caller deletes once this returns.
+        await asyncio.wait({task})
+        if not task.cancelled() and isinstance(task.exception(), BrokenProcessPool):
+            _shutdown_processes(executor)
+
+
+class _TooLarge(Exception):
+    pass
+
+
+def _body_limit(scope):
+    endpoint = "extract_batch" if scope["path"] == "/extract/batch" else "extract"
+    return body_limit(endpoint)
+
+
+async def _read_body(receive, limit):
+    # Small bodies stay in memory; bigger ones go to a named file the pool
+    # process can open, without ever holding the whole upload in RAM.
+    spool = SpooledUpload(max_size=UPLOAD_SPOOL_BYTES, mode="w+b", suffix=".body")
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            spool.close()
+            return None, 0
+        chunk = message.get("body", b"")
+        if chunk:
+            size += len(chunk)
+            if limit and size > limit:
+                # Stop reading as soon as the limit is passed, whatever the
+                # client declared.
+                spool.close()
+                raise _TooLarge()
+            spool.write(chunk)
+        if not message.get("more_body", False):
+            return spool, size
+
+
+async def _send_too_large(send, limit):
+    count_rejected("too_large")
+    metrics.flush()
+    body = json.dumps({"error": f"upload larger than {limit // 2**20} MB", "reason": "too_large"}).encode()
+    await _send_response(send, 413, [("Content-Type", "application/json"), ("Connection", "close")], body + b"\n")
+
+
+async def _send_response(send, status, headers, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+    })
+    view = memoryview(body)
+    for start in range(0, len(body), ASGI_SEND_CHUNK):
+        chunk = bytes(view[start:start + ASGI_SEND_CHUNK])
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _declared_length(scope):
+    for name, value in scope["headers"]:
+        if name.lower() == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def _http(scope, receive, send):
+    limit = _body_limit(scope)
+    declared = _declared_length(scope)
+    if limit and declared is not None and declared > limit:
+        await _send_too_large(send, limit)
+        return
+    try:
+        spool, size = await _read_body(receive, limit)
+    except _TooLarge:
+        await _send_too_large(send, limit)
+        return
+    if spool is None:
+        return
+    environ = _environ(scope, size)
+    try:
+        if spool._rolled:
+            spool.flush()
+            body = spool.name
+        else:
+            spool.seek(0)
+            body = spool.read()
+        executor = _get_processes() if (scope["method"], scope["path"]) in _PROCESS_ROUTES else _threads
+        await _relay(executor, environ, body, send)
+    finally:
+        spool.close()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Start every extraction process now; each one imports (and so
+            # warms up) the app before the first request reaches it.
+            pool = _get_processes()
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(pool, os.getpid) for _ in range(ASGI_PROCESSES)])
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _shutdown_processes()
+            _close_reply_socket()
+            _threads.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "http":
+        await _http(scope, receive, send)
+    elif scope["type"] == "lifespan":
+        await _lifespan(receive, send)
@@ -0,0 +1,108 @@
+"""Dependency-free generator for synthetic table PDFs used by the benchmarks.
+
+Pages are drawn with Helvetica text and stroked lines only, so the output is
+deterministic and needs no fonts, network or third-party libraries.
+"""
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 36
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text(x, y, text, size=7):
+    return f"BT /F1 {size} Tf {x:.1f} {y:.1f} Td ({_escape(text)}) Tj ET"
+
+
+def _cell(page, row, col):
+    return f"p{page}r{row}c{col}"
+
+
+def ruled_table(page, rows, cols, x0=MARGIN, top=PAGE_HEIGHT - MARGIN, row_height=14, ruled=True):
+    """Content stream for one table; ``ruled=False`` draws text only."""
+    col_width = (PAGE_WIDTH - 2 * MARGIN) / cols
+    rows = min(rows, int((top - MARGIN) // row_height))
+    ops = []
+    if ruled:
+        for r in range(rows + 1):
+            y = top - r * row_height
+            ops.append(f"{x0:.1f} {y:.1f} m {x0 + cols * col_width:.1f} {y:.1f} l S")
+        for c in range(cols + 1):
+            x = x0 + c * col_width
+            ops.append(f"{x:.1f} {top:.1f} m {x:.1f} {top - rows * row_height:.1f} l S")
+    for r in range(rows):
+        for c in range(cols):
+            ops.append(_text(x0 + c * col_width + 2, top - (r + 1) * row_height + 4, _cell(page, r, c)))
+    return "\n".join(ops)
+
+
+def tiny_tables(page, count, rows=2, cols=2):
+    """Content stream with ``count`` small ruled tables laid out in a grid."""
+    per_row = 4
+    width = (PAGE_WIDTH - 2 * MARGIN) / per_row
+    height = rows * 12 + 10
+    ops = []
+    for i in range(count):
+        gx, gy = i % per_row, i // per_row
+        top = PAGE_HEIGHT - MARGIN - gy * height
+        if top - rows * 12 < MARGIN:
+            break
+        x0 = MARGIN + gx * width
+        cw = (width - 10) / cols
+        for r in range(rows + 1):
+            y = top - r * 12
+            ops.append(f"{x0:.1f} {y:.1f} m {x0 + cols * cw:.1f} {y:.1f} l S")
+        for c in range(cols + 1):
+            x = x0 + c * cw
+            ops.append(f"{x:.1f} {top:.1f} m {x:.1f} {top - rows * 12:.1f} l S")
+        for r in range(rows):
+            for c in range(cols):
+                ops.append(_text(x0 + c * cw + 2, top - (r + 1) * 12 + 3, f"t{i}r{r}c{c}", size=6))
+    return "\n".join(ops)
+
+
+def build_pdf(contents):
+    """Assemble a PDF from a list of page content streams (str)."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for content in contents:
+        data = content.encode("latin-1")
+        page_id = len(objects) + 1
+        kids.append(f"{page_id} 0 R")
+        objects.append(
+            (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+             f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>").encode("latin-1")
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def document(kind, pages, rows=40, cols=6):
+    """Build a whole document of one ``kind``: ruled, whitespace or tiny."""
+    if kind == "ruled":
+        contents = [ruled_table(p, rows, cols) for p in range(pages)]
+    elif kind == "whitespace":
+        contents = [ruled_table(p, rows, cols, ruled=False) for p in range(pages)]
+    elif kind == "tiny":
+        contents = [tiny_tables(p, rows) for p in range(pages)]
+    else:
+        raise ValueError(f"unknown document kind: {kind}")
+    return build_pdf(contents)
@@ -0,0 +1,235 @@
+"""Benchmark the extraction pipeline on generated PDFs.
+
+    python -m bench.run --quick --output bench-results.json
+    python -m bench.run --baseline bench-baseline.json
+
+Every case is run directly through ``extract_tables`` and over HTTP through
+the Flask test client (CSV and JSON), with the table finding profile given
+by ``--profile``. The direct mode also reports the memory the extracted
+rows take per cell, as a RowStore and as the list of lists it replaced.
+Results are written as JSON; with
+``--baseline`` the run is compared against a stored result and the exit
+status is 1 if any case regressed by more than ``--tolerance``.
+"""
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Results must come from real work: no result cache, no metrics or result
+# files.
+os.environ.setdefault("RESULT_CACHE_BYTES", "0")
+os.environ.setdefault("RESULT_CACHE_DIR", "")
+os.environ.setdefault("METRICS_DIR", "")
+os.environ.setdefault("ARTIFACTS_DIR", "")
+
+import pdfplumber  # noqa: E402
+
+import metrics  # noqa: E402
+from app import app  # noqa: E402
+from bench.pdfgen import document  # noqa: E402
+from extraction import EXTRACT_PROFILE, PROFILES, extract_tables, iter_extract_tables  # noqa: E402
+from rows import RowStore  # noqa: E402
+
+# name, kind, pages, rows per page (tables per page for "tiny"), columns
+CASES = [
+    ("ruled-narrow-1", "ruled", 1, 40, 4),
+    ("ruled-narrow-10", "ruled", 10, 40, 4),
+    ("ruled-narrow-100", "ruled", 100, 40, 4),
+    ("ruled-narrow-1000", "ruled", 1000, 40, 4),
+    ("ruled-wide-10", "ruled", 10, 40, 20),
+    ("ruled-wide-100", "ruled", 100, 40, 20),
+    ("whitespace-10", "whitespace", 10, 40, 6),
+    ("whitespace-100", "whitespace", 100, 40, 6),
+    ("tiny-tables-10", "tiny", 10, 24, 2),
+    ("tiny-tables-100", "tiny", 100, 24, 2),
+]
+
+MODES = ("direct", "http-csv", "http-json")
+
+
+def _run_direct(path, profile):
+    rows = extract_tables(path, profile=profile)
+    return len(rows), None
+
+
+def _run_http(client, path, output, profile):
+    with open(path, "rb") as fh:
+        resp = client.post(
+            "/extract",
+            data={"file": (fh, "bench.pdf"), "output": output, "profile": profile or ""},
+            content_type="multipart/form-data",
+        )
+    body = resp.get_data()
+    if resp.status_code != 200:
+        raise RuntimeError(f"/extract returned {resp.status_code}: {body[:200]!r}")
+    return None, len(body)
+
+
+def _traced_bytes(build):
+    # Bytes still allocated once build() has returned, its result alive.
+    gc.collect()
+    tracemalloc.start()
+    try:
+        held = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del held
+    return size
+
+
+def row_memory(path, profile=None):
+    """Bytes per cell held by the rows of ``path``: as a RowStore and as a
+    list of lists. Cells are copied while traced, so each is a new string
+    as it is when it comes from the table finder."""
+    pages = [tables for _, tables in iter_extract_tables(path, profile=profile, workers=1)]
+    cells = sum(len(r) for tables in pages for tbl in tables for r in tbl)
+
+    def fresh_rows():
+        for tables in pages:
+            for tbl in tables:
+                for r in tbl:
+                    yield [cell.encode().decode() for cell in r]
+
+    lists = _traced_bytes(lambda: list(fresh_rows()))
+    store = _traced_bytes(lambda: RowStore(fresh_rows()))
+    return {
+        "cells": cells,
+        "list_bytes_per_cell": lists / cells if cells else None,
+        "rowstore_bytes_per_cell": store / cells if cells else None,
+    }
+
+
+def measure(fn, repeat):
+    latencies = []
+    peak = 0
+    result = None
+    for _ in range(repeat):
+        metrics.reset_peak_rss()
+        start = time.perf_counter()
+        result = fn()
+        latencies.append(time.perf_counter() - start)
+        peak = max(peak, metrics.peak_rss())
+    return latencies, peak, result
+
+
+def run_case(client, workdir, case, modes, repeat, profile=None):
+    name, kind, pages, rows, cols = case
+    path = os.path.join(workdir, f"{name}.pdf")
+    with open(path, "wb") as fh:
+        fh.write(document(kind, pages, rows, cols))
+
+    results = {}
+    try:
+        for mode in modes:
+            if mode == "direct":
+                fn = lambda: _run_direct(path, profile)  # noqa: E731
+            else:
+                output = mode.split("-", 1)[1]
+                fn = lambda: _run_http(client, path, output, profile)  # noqa: E731
+            # One untimed run so imports and lazy caches do not skew the first sample.
+            fn()
+            latencies, peak, (n_rows, n_bytes) = measure(fn, repeat)
+            median = statistics.median(latencies)
+            entry = {
+                "kind": kind,
+                "pages": pages,
+                "file_bytes": os.path.getsize(path),
+                "repeat": repeat,
+                "latency_s": {"min": min(latencies), "median": median, "max": max(latencies)},
+                "pages_per_s": pages / median if median else None,
+                "peak_rss_bytes": peak,
+            }
+            if n_rows is not None:
+                entry["rows"] = n_rows
+                entry["rows_per_s"] = n_rows / median if median else None
+            if n_bytes is not None:
+                entry["output_bytes"] = n_bytes
+            results[f"{name}/{mode}"] = entry
+            print(f"{name:<20} {mode:<10} median {median * 1000:9.1f} ms  "
+                  f"{entry['pages_per_s']:8.1f} pages/s  peak {peak / 2**20:7.1f} MiB", flush=True)
+            if mode == "direct":
+                entry["row_memory"] = memory = row_memory(path, profile)
+                if memory["cells"]:
+                    print(f"{name:<20} {'rows':<10} {memory['rowstore_bytes_per_cell']:6.1f} bytes/cell "
+                          f"(list of lists {memory['list_bytes_per_cell']:.1f})", flush=True)
+    finally:
+        os.unlink(path)
+    return results
+
+
+def compare(current, baseline, tolerance):
+    regressions = []
+    for key, entry in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        for metric, now, then in (
+            ("latency", entry["latency_s"]["median"], base["latency_s"]["median"]),
+            ("peak_rss", entry["peak_rss_bytes"], base["peak_rss_bytes"]),
+        ):
+            if then and now > then * (1 + tolerance):
+                regressions.append(f"{key}: {metric} {then:.4g} -> {now:.4g} (+{(now / then - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="bench-results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/growth, 0.25 = 25%%")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case and mode")
+    parser.add_argument("--quick", action="store_true", help="skip cases over 100 pages")
+    parser.add_argument("--case", action="append", default=[], help="only run cases matching this glob, e.g. 'ruled-*'")
+    parser.add_argument("--mode", action="append", choices=MODES, help="only run these modes")
+    parser.add_argument("--profile", choices=sorted(PROFILES), help="table finding profile (default: server default)")
+    args = parser.parse_args(argv)
+
+    cases = [c for c in CASES if not (args.quick and c[2] > 100)]
+    if args.case:
+        cases = [c for c in cases if any(fnmatch.fnmatch(c[0], pattern) for pattern in args.case)]
+    modes = args.mode or list(MODES)
+
+    current = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pdfplumber": pdfplumber.__version__,
+            "profile": args.profile or EXTRACT_PROFILE,
+            "env": {k: v for k, v in os.environ.items() if k.startswith("EXTRACT_")},
+        },
+        "results": {},
+    }
+    client = app.test_client()
+    with tempfile.TemporaryDirectory(prefix="pdf2csvhub-bench-") as workdir:
+        for case in cases:
+            current["results"].update(run_case(client, workdir, case, modes, args.repeat, args.profile))
+
+    with open(args.output, "w") as fh:
+        json.dump(current, fh, indent=2, sort_keys=True)
+    print(f"wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = compare(current, baseline, args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            return 1
+        print("no regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
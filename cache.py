@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import disk
+
+# In-process tier, per gunicorn worker.
+RESULT_CACHE_BYTES = int(os.environ.get("RESULT_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Optional on-disk tier shared by every worker on the box.
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "")
+RESULT_CACHE_DISK_BYTES = int(os.environ.get("RESULT_CACHE_DISK_BYTES", str(1024 * 1024 * 1024)))
+
+# Prune the disk tier every this many writes rather than on each one.
+_DISK_PRUNE_EVERY = 32
+
+
+def make_key(digest, **options):
+    blob = json.dumps(options, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256((digest + "\n" + blob).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES, disk_dir=RESULT_CACHE_DIR,
+                 disk_max_bytes=RESULT_CACHE_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self._disk = None
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "disk_evictions": 0,
+        }
+        if self.disk_dir:
+            self._disk = disk.LRUDirectory(self.disk_dir, max_bytes=disk_max_bytes, prune_every=_DISK_PRUNE_EVERY)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+
+        entry = self._disk_get(key)
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._memory_put(key, entry)
+        return entry
+
+    def put(self, key, body, mimetype, headers=None):
+        entry = (body, mimetype, dict(headers or {}))
+        with self._lock:
+            self.stats["stores"] += 1
+            self._memory_put(key, entry)
+        self._disk_put(key, entry)
+
+    def snapshot(self):
+        with self._lock:
+            out = dict(self.stats)
+            out["entries"] = len(self._entries)
+            out["bytes"] = self._size
+            out["max_bytes"] = self.max_bytes
+        out["disk"] = bool(self.disk_dir)
+        return out
+
+    def _memory_put(self, key, entry):
+        size = len(entry[0])
+        # One huge result should not flush everything else out.
+        if size > self.max_bytes // 4:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old[0])
+        self._entries[key] = entry
+        self._size += size
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted[0])
+            self.stats["evictions"] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as fh:
+                meta = json.loads(fh.readline())
+                body = fh.read()
+            disk.touch(path)
+        except (OSError, ValueError):
+            return None
+        return body, meta["mimetype"], meta["headers"]
+
+    def _disk_put(self, key, entry):
+        if not self.disk_dir:
+            return
+        body, mimetype, headers = entry
+        path = self._disk_path(key)
+        meta = json.dumps({"mimetype": mimetype, "headers": headers}).encode("utf-8") + b"\n"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            disk.write_atomic(path, [meta, body])
+        except OSError:
+            return
+        evicted = self._disk.added()
+        if evicted:
+            with self._lock:
+                self.stats["disk_evictions"] += evicted
+
+
+result_cache = ResultCache()
@@ -0,0 +1,165 @@
+import os
+import time
+import zlib
+
+from flask import g, request
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+# Buffered bodies smaller than this are sent as-is; streams are always compressed.
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+# Levels favour throughput over ratio: the text we send compresses well anyway.
+COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "5"))
+COMPRESS_ZSTD_LEVEL = int(os.environ.get("COMPRESS_ZSTD_LEVEL", "3"))
+COMPRESS_BROTLI_LEVEL = int(os.environ.get("COMPRESS_BROTLI_LEVEL", "4"))
+
+COMPRESSIBLE = {
+    "text/csv",
+    "text/html",
+    "text/plain",
+    "application/json",
+    "application/x-ndjson",
+}
+
+
+class _Gzip:
+    def __init__(self):
+        self._obj = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data):
+        # A sync flush per chunk keeps streamed responses flowing page by page.
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+class _Zstd:
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(level=COMPRESS_ZSTD_LEVEL).compressobj()
+
+    def chunk(self, data):
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=COMPRESS_BROTLI_LEVEL)
+
+    def chunk(self, data):
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+def available_encodings():
+    # Server preference order, best first.
+    encodings = []
+    if zstandard is not None:
+        encodings.append(("zstd", _Zstd))
+    if brotli is not None:
+        encodings.append(("br", _Brotli))
+    encodings.append(("gzip", _Gzip))
+    return encodings
+
+
+ENCODINGS = available_encodings()
+
+
+def negotiate(accept_encodings):
+    best = None
+    best_q = 0
+    for name, factory in ENCODINGS:
+        q = accept_encodings[name]
+        if q > best_q:
+            best, best_q = (name, factory), q
+    return best
+
+
+def _compress_iter(body, compressor):
+    try:
+        for data in body:
+            if data:
+                out = compressor.chunk(data)
+                if out:
+                    yield out
+        yield compressor.finish()
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+
+
+# Views whose range-capable downloads are sent as stored: a Range is an
+# offset into the identity body, and a resumed download must see the same
+# bytes the first attempt did.
+_IDENTITY_RANGES = set()
+
+
+def identity_ranges(view):
+    """Mark a view's ``Accept-Ranges: bytes`` responses as never encoded."""
+    _IDENTITY_RANGES.add(view.__name__)
+    return view
+
+
+def compress_response(resp):
+    if resp.status_code != 200 or "Content-Encoding" in resp.headers:
+        return resp
+    if resp.headers.get("Accept-Ranges") == "bytes" and request.endpoint in _IDENTITY_RANGES:
+        return resp
+    if resp.mimetype not in COMPRESSIBLE:
+        return resp
+    resp.vary.add("Accept-Encoding")
+
+    chosen = negotiate(request.accept_encodings)
+    if chosen is None:
+        return resp
+    name, factory = chosen
+    streamed = resp.is_streamed or resp.direct_passthrough
+    if not streamed and resp.calculate_content_length() < COMPRESS_MIN_BYTES:
+        return resp
+    if not _encoded_etag(resp, name):
+        return resp
+
+    if streamed:
+        body = resp.response
+        resp.direct_passthrough = False
+        resp.response = _compress_iter(body, factory())
+        resp.headers.pop("Content-Length", None)
+    else:
+        start = time.perf_counter()
+        compressor = factory()
+        resp.set_data(compressor.chunk(resp.get_data()) + compressor.finish())
+        if "timings" in g:
+            g.timings["compress"] = time.perf_counter() - start
+    resp.headers["Content-Encoding"] = name
+    return resp
+
+
+def _encoded_etag(resp, name):
+    # A strong ETag names one representation, and the encoded body is a
+    # different one; the identity ETag would let a cache or an If-Range
+    # mix the two up. Any If-None-Match was checked against the identity
+    # ETag, so it is checked again against this one; False means it matched
+    # and resp is now a 304.
+    etag, weak = resp.get_etag()
+    if etag is None:
+        return True
+    resp.set_etag(f"{etag}-{name}", weak)
+    resp.make_conditional(request)
+    return resp.status_code == 200
+
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -0,0 +1,94 @@
+def _width(rows):
+    return max((len(r) for r in rows), default=0)
+
+
+def _continues(table, page_number, rows):
+    # A table on the next page continues the open one when it repeats the
+    # same header row with the same width; without a repeated header two
+    # unrelated tables of the same shape would be glued together.
+    return (
+        page_number == table["last_page"] + 1
+        and rows[0] == table["header"]
+        and _width(rows) == table["width"]
+    )
+
+
+def merge_pages(pages, tables):
+    """Merge tables that continue across pages and drop repeated rows.
+
+    ``pages`` yields ``(page_number, tables)`` as from
+    ``iter_extract_tables``; the same shape is yielded back, one page
+    behind, with the repeated header row of every continuation removed and
+    with page furniture removed: a last row that recurs unchanged at the
+    end of consecutive parts of a table, such as "continued overleaf".
+
+    ``tables`` is a list that receives one metadata dict per logical table
+    as it is opened: its pages, width, header, ``first_row`` (offset in the
+    flattened output), ``rows`` and how many rows were removed. Only the
+    open table and one page of rows are held at any time.
+    """
+    state = {"open": None, "emitted": 0}
+    pending = None
+
+    def open_table(page_number, rows):
+        table = {
+            "table": len(tables),
+            "first_page": page_number,
+            "last_page": page_number,
+            "parts": 1,
+            "width": _width(rows),
+            "header": rows[0],
+            "first_row": None,
+            "rows": 0,
+            "headers_removed": 0,
+            "footers_removed": 0,
+            "_footer": None,
+        }
+        tables.append(table)
+        state["open"] = table
+        return table
+
+    def release(held):
+        page_number, parts = held
+        out = []
+        for table, rows in parts:
+            if not rows:
+                continue
+            if table["first_row"] is None:
+                table["first_row"] = state["emitted"]
+            table["rows"] += len(rows)
+            state["emitted"] += len(rows)
+            out.append(rows)
+        return page_number, out
+
+    for page_number, page_tables in pages:
+        parts = []
+        for index, rows in enumerate(page_tables):
+            if not rows:
+                continue
+            table = state["open"]
+            if not parts and pending is not None and table is not None and _continues(table, page_number, rows):
+                kept = [r for r in rows[1:] if r != table["header"]]
+                table["headers_removed"] += len(rows) - len(kept)
+                held_rows = pending[1][-1][1] if pending[1] else None
+                if table["_footer"] is None and held_rows and kept and held_rows[-1] == kept[-1]:
+                    table["_footer"] = held_rows.pop()
+                    table["footers_removed"] += 1
+                if table["_footer"] is not None and kept and kept[-1] == table["_footer"]:
+                    kept.pop()
+                    table["footers_removed"] += 1
+                table["last_page"] = page_number
+                table["parts"] += 1
+                parts.append((table, kept))
+            else:
+                parts.append((open_table(page_number, rows), list(rows)))
+        if not parts:
+            # A page without tables ends whatever table was open.
+            state["open"] = None
+        if pending is not None:
+            yield release(pending)
+        pending = (page_number, parts)
+    if pending is not None:
+        yield release(pending)
+    for table in tables:
+        table.pop("_footer", None)
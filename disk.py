@@ -0,0 +1,112 @@
+import os
+import tempfile
+import threading
+
+
+def write_atomic(path, data):
+    """Write ``data`` (bytes, or an iterable of bytes chunks) to ``path``.
+
+    The data goes to a unique temporary file in the same directory that is
+    then renamed over ``path``, so readers in other threads and workers see
+    the old file or the new one, never half of one.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            if isinstance(data, bytes):
+                fh.write(data)
+            else:
+                for chunk in data:
+                    fh.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def touch(path):
+    """Mark ``path`` as just used for :func:`prune_lru`; False if it is gone."""
+    try:
+        os.utime(path)
+    except OSError:
+        return False
+    return True
+
+
+def prune_lru(directory, max_bytes=None, max_entries=None, suffixes=None):
+    """Delete the least recently used entries under ``directory`` until it
+    is within ``max_bytes`` and ``max_entries``; returns how many went.
+
+    An entry is every file sharing a name up to its first dot (``<key>``,
+    ``<key>.json``, ``<key>.body``...), aged by the newest mtime among them.
+    With ``suffixes`` only files ending in one of them count, and an entry's
+    files are deleted in that order. Temporary files are never touched.
+    """
+    entries = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.endswith(".tmp"):
+                continue
+            stem, dot, suffix = name.partition(".")
+            rank = 0
+            if suffixes is not None:
+                if dot + suffix not in suffixes:
+                    continue
+                rank = suffixes.index(dot + suffix)
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entry = entries.setdefault(os.path.join(root, stem), [0.0, 0, []])
+            entry[0] = max(entry[0], st.st_mtime)
+            entry[1] += st.st_size
+            entry[2].append((rank, path))
+    total = sum(size for _, size, _ in entries.values())
+    count = len(entries)
+    removed = 0
+    for _, size, files in sorted(entries.values()):
+        if (max_bytes is None or total <= max_bytes) and (max_entries is None or count <= max_entries):
+            break
+        for _, path in sorted(files):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        total -= size
+        count -= 1
+        removed += 1
+    return removed
+
+
+class LRUDirectory:
+    """A directory shared by every worker on the box, kept within a size or
+    entry budget by pruning the least recently used entries.
+
+    Pruning walks the whole directory, so it runs every ``prune_every`` new
+    entries rather than on each one.
+    """
+
+    def __init__(self, directory, max_bytes=None, max_entries=None, suffixes=None, prune_every=32):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.suffixes = suffixes
+        self.prune_every = prune_every
+        self._lock = threading.Lock()
+        self._added = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def added(self):
+        """Count a new entry and prune if one is due; returns how many
+        entries were pruned."""
+        with self._lock:
+            self._added += 1
+            due = self._added % self.prune_every == 0
+        return self.prune() if due else 0
+
+    def prune(self):
+        return prune_lru(self.directory, self.max_bytes, self.max_entries, self.suffixes)
@@ -0,0 +1,175 @@
+import os
+import re
+import sys
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+
+import disk
+import ocr
+
+# Uploaded documents, stored by content hash and shared by every worker on
+# the box; the least recently used are pruned past DOCUMENTS_MAX_BYTES.
+DOCUMENTS_DIR = os.environ.get("DOCUMENTS_DIR", os.path.join(tempfile.gettempdir(), "pdf2csvhub-documents"))
+DOCUMENTS_MAX_BYTES = int(os.environ.get("DOCUMENTS_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Parsed page layouts kept per process for stored documents; 0 disables.
+LAYOUT_CACHE_BYTES = int(os.environ.get("LAYOUT_CACHE_BYTES", str(256 * 1024 * 1024)))
+
+# Prune the directory every this many new documents rather than on each one.
+_PRUNE_EVERY = 16
+
+_ID = re.compile(r"^[0-9a-f]{64}$")
+
+
+class DocumentStore:
+    def __init__(self, directory=DOCUMENTS_DIR, max_bytes=DOCUMENTS_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._disk = disk.LRUDirectory(directory, max_bytes=max_bytes, suffixes=(".pdf",), prune_every=_PRUNE_EVERY)
+
+    def _path(self, doc_id):
+        return os.path.join(self.directory, doc_id + ".pdf")
+
+    def put(self, doc_id, stream):
+        """Store ``stream`` under ``doc_id`` (its sha256); returns its size."""
+        path = self._path(doc_id)
+        if disk.touch(path):
+            return os.path.getsize(path)
+        stream.seek(0)
+        try:
+            disk.write_atomic(path, iter(lambda: stream.read(1024 * 1024), b""))
+        finally:
+            stream.seek(0)
+        size = os.path.getsize(path)
+        self._disk.added()
+        return size
+
+    def path(self, doc_id):
+        """Path of a stored document, or None if it is unknown or expired."""
+        if not _ID.match(doc_id or ""):
+            return None
+        path = self._path(doc_id)
+        return path if disk.touch(path) else None
+
+    def delete(self, doc_id):
+        if not _ID.match(doc_id or ""):
+            return False
+        try:
+            os.unlink(self._path(doc_id))
+        except OSError:
+            return False
+        layouts.discard(doc_id)
+        return True
+
+    def snapshot(self):
+        count = size = 0
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".pdf"):
+                    count += 1
+                    size += entry.stat().st_size
+        except OSError:
+            pass
+        return {"documents": count, "bytes": size, "max_bytes": self.max_bytes, "dir": self.directory}
+
+
+def _pack(objects):
+    # One column per key instead of one dict per object: float columns go
+    # into arrays, and repeated values (font names, colours, matrices) are
+    # stored once. Image streams are dropped; they pin the raw image data.
+    packed = {}
+    size = 0
+    shared = {}
+    for kind, objs in objects.items():
+        keys = sorted({key for obj in objs for key in obj if key != "stream"})
+        columns = []
+        for key in keys:
+            values = [obj.get(key) for obj in objs]
+            if all(type(v) is float for v in values):
+                column = array("d", values)
+                size += column.itemsize * len(column)
+            else:
+                column = []
+                for v in values:
+                    try:
+                        # Keyed by type too: True, 1 and 1.0 are equal keys.
+                        v = shared.setdefault((type(v), v), v)
+                    except TypeError:
+                        size += sys.getsizeof(v)
+                    column.append(v)
+                size += 8 * len(column)
+            columns.append(column)
+        packed[kind] = (keys, columns, len(objs))
+    size += sum(sys.getsizeof(v) for v in shared.values())
+    return packed, size
+
+
+def _unpack(packed):
+    objects = {}
+    for kind, (keys, columns, count) in packed.items():
+        objects[kind] = [dict(zip(keys, values)) for values in zip(*columns)] if keys else [{}] * count
+    return objects
+
+
+class LayoutCache:
+    """Parsed page objects of stored documents, LRU by estimated size.
+
+    Serving a page from here skips pdfminer's content stream parsing and
+    layout analysis; only table finding and serialization are left.
+    """
+
+    def __init__(self, max_bytes=LAYOUT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def get(self, doc_id, page_number):
+        key = (doc_id, page_number)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        return _unpack(entry[0])
+
+    def put(self, doc_id, page):
+        if self.max_bytes <= 0 or ocr.is_scanned(page):
+            # Scanned pages go to OCR, which needs the image streams.
+            return
+        packed, size = _pack(page.objects)
+        key = (doc_id, page.page_number)
+        with self._lock:
+            if size > self.max_bytes // 4:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._entries[key] = (packed, size)
+            self._size += size
+            self.stats["stores"] += 1
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+                self.stats["evictions"] += 1
+
+    def discard(self, doc_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == doc_id]:
+                self._size -= self._entries.pop(key)[1]
+
+    def snapshot(self):
+        with self._lock:
+            out = dict(self.stats)
+            out["pages"] = len(self._entries)
+            out["bytes"] = self._size
+            out["max_bytes"] = self.max_bytes
+        return out
+
+
+store = DocumentStore()
+layouts = LayoutCache()
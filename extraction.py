@@ -0,0 +1,699 @@
+import atexit
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import pdfplumber
+
+import documents
+import metrics
+import ocr
+import profiling
+from dedupe import merge_pages
+from rows import RowStore
+
+# Number of extraction processes. 1 keeps everything in the request process.
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", "1"))
+# Pages per shard; 0 splits the document evenly across the workers.
+EXTRACT_SHARD_PAGES = int(os.environ.get("EXTRACT_SHARD_PAGES", "0"))
+# Documents shorter than this are not worth the inter-process round trip.
+EXTRACT_PARALLEL_MIN_PAGES = int(os.environ.get("EXTRACT_PARALLEL_MIN_PAGES", "8"))
+# Abort an extraction once the process RSS has grown this many MiB since it
+# started; 0 disables.
+EXTRACT_MEMORY_LIMIT_MB = int(os.environ.get("EXTRACT_MEMORY_LIMIT_MB", "0"))
+# Hard limit on one page: pages then run in a child process that is killed
+# when a page takes longer. 0 runs pages in-process with no limit.
+EXTRACT_PAGE_TIMEOUT = float(os.environ.get("EXTRACT_PAGE_TIMEOUT", "0"))
+
+# Named table finder settings, picked per request with ``profile``. Keys
+# not listed keep pdfplumber's defaults; "default" is exactly those.
+PROFILES = {
+    "default": {
+        "table_settings": {},
+    },
+    # Ruled statements and invoices: only the ruling-line pipeline, with
+    # short edges (glyph strokes, underlines) dropped before merging and
+    # pages without any ruling skipped unless the request says otherwise.
+    "fast-ruled": {
+        "table_settings": {
+            "vertical_strategy": "lines",
+            "horizontal_strategy": "lines",
+            "edge_min_length": 10,
+        },
+        "prescan": True,
+    },
+    # Whitespace-separated columns with no ruling lines at all.
+    "text-aligned": {
+        "table_settings": {
+            "vertical_strategy": "text",
+            "horizontal_strategy": "text",
+            "min_words_vertical": 3,
+            "min_words_horizontal": 1,
+            "text_x_tolerance": 2,
+        },
+    },
+    # Looser snapping for slightly misaligned rules, and a text-strategy
+    # pass on pages where the ruling lines found nothing.
+    "accurate": {
+        "table_settings": {
+            "vertical_strategy": "lines",
+            "horizontal_strategy": "lines",
+            "snap_tolerance": 4,
+            "join_tolerance": 4,
+            "intersection_tolerance": 5,
+        },
+        "fallback": {
+            "vertical_strategy": "text",
+            "horizontal_strategy": "text",
+            "min_words_vertical": 3,
+        },
+    },
+}
+EXTRACT_PROFILE = os.environ.get("EXTRACT_PROFILE", "default")
+if EXTRACT_PROFILE not in PROFILES:
+    raise ValueError(f"EXTRACT_PROFILE must be one of {', '.join(PROFILES)}, not {EXTRACT_PROFILE!r}")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_pool = None
+_pool_pid = None
+
+
+class MemoryLimitExceeded(Exception):
+    pass
+
+
+def current_rss():
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _clean_tables(tables):
+    out = []
+    for tbl in tables or ():
+        if not tbl:
+            continue
+        out.append([[(cell if cell is not None else "") for cell in r] for r in tbl])
+    return out
+
+
+def _page_tables(page, table_settings=None):
+    try:
+        tables = page.extract_tables(table_settings)
+    except Exception:
+        tables = None
+    return _clean_tables(tables)
+
+
+def _has_table_signals(page, table_settings=None):
+    # Line-based strategies only find tables bounded by ruling lines, which
+    # pdfplumber builds from line, rect and curve objects ("lines_strict":
+    # line objects only). A page with none of those cannot produce a table,
+    # so skipping it is lossless. Text strategies need words instead.
+    settings = table_settings or {}
+    strategies = {settings.get("vertical_strategy", "lines"), settings.get("horizontal_strategy", "lines")}
+    if "explicit" in strategies:
+        return True
+    objects = page.objects
+    if "text" in strategies:
+        return bool(objects.get("char"))
+    if "lines" in strategies and (objects.get("rect") or objects.get("curve")):
+        return True
+    return len(objects.get("line", ())) >= 4
+
+
+def _release_page(page, low_memory):
+    # pdfplumber keeps every page's chars, lines and layout cached on the
+    # Page for as long as the PDF is open; we never look at a page twice.
+    page.close()
+    if low_memory:
+        # Also drop pdfminer's parsed-object cache (content streams, images);
+        # anything still needed is re-read from the file on demand. These
+        # are private to PDFDocument (pdfminer.six 20231228, pinned by
+        # pdfplumber 0.11); if a release renames them this becomes a no-op.
+        for name in ("_cached_objs", "_parsed_objs"):
+            cache = getattr(page.pdf.doc, name, None)
+            if isinstance(cache, dict):
+                cache.clear()
+
+
+def _memory_baseline(memory_limit):
+    return current_rss() if memory_limit > 0 else 0
+
+
+def _check_memory(page, memory_limit, baseline):
+    # RSS is per process, so growth from the baseline also counts whatever
+    # other requests in the same worker allocated meanwhile.
+    if memory_limit <= 0:
+        return
+    grown = current_rss() - baseline
+    if grown > memory_limit:
+        raise MemoryLimitExceeded(
+            f"memory limit exceeded on page {page.page_number}: "
+            f"grew {grown // 2**20} MiB, limit {memory_limit // 2**20} MiB"
+        )
+
+
+def _scan(page):
+    # A scanned page has no text for the table finder. Serve it from the OCR
+    # cache, or render it here, while the page is open, for ocr.run().
+    key = ocr.image_key(page)
+    tables = ocr.cached(key)
+    if tables is not None:
+        return tables, {"key": key, "png": None, "cached": True}
+    png = ocr.render(page) if ocr.available() else None
+    return [], {"key": key, "png": png, "cached": False}
+
+
+def _process_page(page, profile=None, prescan=False, use_ocr=True, low_memory=False,
+                  memory_limit=0, memory_baseline=0, layout_key=None):
+    profile = profile or EXTRACT_PROFILE
+    settings = PROFILES[profile]
+    table_settings = settings["table_settings"]
+    # The fallback runs when the first pass finds nothing, so prescan only
+    # skips a page neither of them could find a table on.
+    finders = (table_settings, settings["fallback"]) if settings.get("fallback") else (table_settings,)
+    scan = None
+    start = time.perf_counter()
+    layout = documents.layouts.get(layout_key, page.page_number) if layout_key else None
+    if layout is not None:
+        # Page.objects is what the table finder reads; with it in place the
+        # content stream is never parsed.
+        page._objects = layout
+    if use_ocr and ocr.is_scanned(page):
+        tables, scan = _scan(page)
+    elif prescan and not any(_has_table_signals(page, s) for s in finders):
+        tables = None
+    else:
+        tables = _page_tables(page, table_settings)
+        if not tables and settings.get("fallback"):
+            tables = _page_tables(page, settings["fallback"])
+    if layout_key and layout is None:
+        documents.layouts.put(layout_key, page)
+    elapsed = time.perf_counter() - start
+    _release_page(page, low_memory)
+    _check_memory(page, memory_limit, memory_baseline)
+    return tables, elapsed, scan
+
+
+def _expired(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def _extract_shard(source, page_numbers, page_options, deadline=None):
+    # Runs in a pool worker: one open of the file (a path, or the bytes of
+    # an in-memory upload) per shard, pages in order. Stops early at the
+    # deadline (time.monotonic() is system-wide); the caller treats the
+    # pages not returned as timed out.
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    page_options = dict(page_options, memory_baseline=_memory_baseline(page_options["memory_limit"]))
+    results = []
+    with pdfplumber.open(source, pages=page_numbers) as pdf:
+        for page in pdf.pages:
+            if _expired(deadline):
+                break
+            results.append((page.page_number,) + _process_page(page, **page_options))
+    return results
+
+
+def _runner_main(conn):
+    # Child side of _PageRunner: extract the pages it is sent, one message
+    # per page, until the pipe closes.
+    while True:
+        try:
+            source, page_numbers, page_options = conn.recv()
+        except EOFError:
+            return
+        try:
+            if isinstance(source, bytes):
+                source = io.BytesIO(source)
+            page_options = dict(page_options, memory_baseline=_memory_baseline(page_options["memory_limit"]))
+            with pdfplumber.open(source, pages=page_numbers) as pdf:
+                for page in pdf.pages:
+                    conn.send(("page", page.page_number) + _process_page(page, **page_options))
+            conn.send(("done",))
+        except Exception as e:
+            try:
+                conn.send(("error", e))
+            except Exception:
+                conn.send(("error", RuntimeError(str(e))))
+
+
+class _PageRunner:
+    """A child process that extracts pages and can be killed mid-page."""
+
+    def __init__(self):
+        ctx = multiprocessing.get_context("spawn")
+        # Only the process that started the child may use or reap it.
+        self.owner = os.getpid()
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_runner_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+_runners = []
+_runners_lock = threading.Lock()
+
+
+def _acquire_runner():
+    with _runners_lock:
+        while _runners:
+            runner = _runners.pop()
+            if runner.owner == os.getpid() and runner.process.is_alive():
+                return runner
+    return _PageRunner()
+
+
+def _release_runner(runner):
+    with _runners_lock:
+        _runners.append(runner)
+
+
+def prestart_runner():
+    # Spawn one runner ahead of the first request that needs it.
+    _release_runner(_PageRunner())
+
+
+def _shutdown_runners():
+    with _runners_lock:
+        runners = list(_runners)
+        _runners.clear()
+    for runner in runners:
+        if runner.owner == os.getpid():
+            runner.kill()
+
+
+def _forget_runners():
+    # A forked child (a gunicorn worker under preload_app) inherits the
+    # parent's idle runners, which it can neither use nor reap; its own are
+    # started on demand.
+    global _runners_lock
+    _runners_lock = threading.Lock()
+    _runners.clear()
+
+
+atexit.register(_shutdown_runners)
+os.register_at_fork(after_in_child=_forget_runners)
+
+
+def _source_payload(source, path):
+    if path is not None:
+        return path
+    source.seek(0)
+    data = source.read()
+    source.seek(0)
+    return data
+
+
+def _iter_isolated(payload, selected, page_options, page_timeout, deadline, stats):
+    # Pages go to a _PageRunner in order. A page that outlives page_timeout
+    # (or the deadline), or kills the child, is recorded as timed out; the
+    # child is replaced and carries on with the page after it.
+    remaining = list(selected)
+    while remaining:
+        runner = _acquire_runner()
+        busy = True
+        try:
+            runner.conn.send((payload, remaining, page_options))
+            while remaining:
+                wait = page_timeout
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                try:
+                    ready = wait > 0 and runner.conn.poll(wait)
+                    msg = runner.conn.recv() if ready else None
+                except (EOFError, OSError):
+                    # The child died (crash, OOM kill) on this page.
+                    msg = None
+                if msg is None:
+                    if _expired(deadline):
+                        _timed_out(stats, remaining, "deadline")
+                        remaining = []
+                    else:
+                        _timed_out(stats, [remaining.pop(0)], "page_timeout")
+                    break
+                if msg[0] == "error":
+                    busy = False
+                    raise msg[1]
+                page_number, *result = msg[1:]
+                remaining.pop(0)
+                yield page_number, _record(stats, page_number, *result)
+            else:
+                busy = runner.conn.recv()[0] != "done"
+        finally:
+            # A runner still working on our pages cannot be handed to the
+            # next request; kill it rather than wait.
+            if busy:
+                runner.kill()
+            else:
+                _release_runner(runner)
+
+
+def _worker_ready():
+    import warmup
+
+    warmup.warm_up()
+    return os.getpid()
+
+
+def parse_page_spec(spec):
+    """Parse ``"1-5,40,90-"`` into ``[(1, 5), (40, 40), (90, None)]``."""
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, dash, hi = part.partition("-")
+        try:
+            start = int(lo)
+            stop = (int(hi) if hi.strip() else None) if dash else start
+        except ValueError:
+            raise ValueError(f"invalid page range: {part!r}")
+        if start < 1 or (stop is not None and stop < start):
+            raise ValueError(f"invalid page range: {part!r}")
+        ranges.append((start, stop))
+    if not ranges:
+        raise ValueError("pages must not be empty")
+    return ranges
+
+
+def resolve_pages(ranges, n_pages):
+    selected = set()
+    for start, stop in ranges:
+        stop = n_pages if stop is None else min(stop, n_pages)
+        selected.update(range(start, stop + 1))
+    return sorted(selected)
+
+
+def format_page_spec(page_numbers):
+    """Format sorted page numbers as ranges, ``[1, 2, 3, 7]`` -> ``"1-3,7"``."""
+    parts = []
+    for n in page_numbers:
+        if parts and parts[-1][1] == n - 1:
+            parts[-1][1] = n
+        else:
+            parts.append([n, n])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in parts)
+
+
+def shard_ranges(n_pages, workers, shard_pages=0):
+    if n_pages <= 0:
+        return []
+    if shard_pages <= 0:
+        shard_pages = -(-n_pages // max(workers, 1))
+    return [(start, min(start + shard_pages, n_pages)) for start in range(0, n_pages, shard_pages)]
+
+
+def get_pool():
+    global _pool, _pool_pid
+    # A pool inherited across fork (gunicorn preload) belongs to the parent.
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    _pool = ProcessPoolExecutor(
+        max_workers=EXTRACT_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    _pool_pid = os.getpid()
+    # Start every worker now so the first real request does not pay for
+    # interpreter start-up and the pdfplumber import.
+    for fut in [_pool.submit(_worker_ready) for _ in range(EXTRACT_WORKERS)]:
+        fut.result()
+    return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _pool_pid = None
+
+
+atexit.register(shutdown_pool)
+
+
+def _source_path(source):
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and os.path.exists(name):
+        return name
+    return None
+
+
+def _timed_out(stats, page_numbers, reason):
+    stats["timed_out_pages"].extend(page_numbers)
+    stats["partial"] = True
+    metrics.inc("pages_timed_out_total", len(page_numbers), reason=reason)
+
+
+def _record(stats, page_number, tables, elapsed, scan=None):
+    profile = stats["profile"]
+    profiling.record_page(page_number, elapsed)
+    if scan is not None:
+        stats["pages_scanned"] += 1
+        if scan["png"] is not None:
+            tables = ocr.run(scan["key"], scan["png"])
+        if scan["cached"]:
+            metrics.inc("ocr_pages_total", outcome="cached")
+        if scan["png"] is not None or scan["cached"]:
+            stats["pages_ocr"] += 1
+    stats["pages_done"] += 1
+    if tables is None:
+        stats["pages_skipped"] += 1
+        stats["prescan_seconds"] += elapsed
+        metrics.inc("pages_skipped_total", profile=profile)
+    else:
+        stats["extract_seconds"] += elapsed
+        metrics.inc("pages_processed_total", profile=profile)
+        metrics.observe("page_seconds", elapsed, profile=profile)
+    processed = stats["pages_done"] - stats["pages_skipped"]
+    if processed:
+        # Estimate: skipped pages would have cost as much as the pages we
+        # did extract, minus what the pre-scan itself took.
+        saved = stats["pages_skipped"] * stats["extract_seconds"] / processed - stats["prescan_seconds"]
+        stats["prescan_saved_ms"] = round(max(saved, 0.0) * 1000, 1)
+    return tables or []
+
+
+def _iter_pages(source, workers=None, shard_pages=None, stats=None, *, pages=None, profile=None,
+                 prescan=None, use_ocr=True, low_memory=False, memory_limit=None,
+                 deadline=None, page_timeout=None, layout_key=None):
+    workers = EXTRACT_WORKERS if workers is None else workers
+    shard_pages = EXTRACT_SHARD_PAGES if shard_pages is None else shard_pages
+    stats = {} if stats is None else stats
+    if memory_limit is None:
+        memory_limit = EXTRACT_MEMORY_LIMIT_MB * 2**20
+    if page_timeout is None:
+        page_timeout = EXTRACT_PAGE_TIMEOUT
+    profile = profile or EXTRACT_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(f"unknown profile {profile!r}, expected one of {', '.join(PROFILES)}")
+    if prescan is None:
+        prescan = PROFILES[profile].get("prescan", False)
+    page_options = {
+        "profile": profile,
+        "prescan": prescan,
+        "use_ocr": use_ocr,
+        "low_memory": low_memory,
+        "memory_limit": memory_limit,
+        "memory_baseline": _memory_baseline(memory_limit),
+        "layout_key": layout_key,
+    }
+
+    path = _source_path(source)
+    start = time.perf_counter()
+    with pdfplumber.open(source) as pdf:
+        n_pages = len(pdf.pages)
+        open_seconds = time.perf_counter() - start
+        metrics.observe("stage_seconds", open_seconds, stage="open")
+        selected = resolve_pages(pages, n_pages) if pages else list(range(1, n_pages + 1))
+        stats.update(
+            profile=profile,
+            open_seconds=open_seconds,
+            pages_in_document=n_pages,
+            pages_total=len(selected),
+            pages_done=0,
+            pages_skipped=0,
+            extract_seconds=0.0,
+            prescan_seconds=0.0,
+            prescan_saved_ms=0.0,
+            pages_scanned=0,
+            pages_ocr=0,
+            timed_out_pages=[],
+            partial=False,
+        )
+        if page_timeout <= 0 and (workers <= 1 or len(selected) < EXTRACT_PARALLEL_MIN_PAGES):
+            for i, page_number in enumerate(selected):
+                if _expired(deadline):
+                    _timed_out(stats, selected[i:], "deadline")
+                    return
+                page = pdf.pages[page_number - 1]
+                yield page_number, _record(stats, page_number, *_process_page(page, **page_options))
+            return
+
+    if page_timeout > 0:
+        # Killable pages trade the pool's parallelism for isolation: one
+        # child per request works through the pages in order.
+        payload = _source_payload(source, path)
+        yield from _iter_isolated(payload, selected, page_options, page_timeout, deadline, stats)
+        return
+
+    done = 0
+    futures = []
+    try:
+        pool = get_pool()
+        # Pool workers reopen a file by name; an in-memory upload is sent
+        # to them as bytes.
+        payload = _source_payload(source, path)
+        shards = [selected[start:stop] for start, stop in shard_ranges(len(selected), workers, shard_pages)]
+        futures = [pool.submit(_extract_shard, payload, shard, page_options, deadline) for shard in shards]
+        for shard, fut in zip(shards, futures):
+            results = fut.result()
+            for page_number, *result in results:
+                done += 1
+                yield page_number, _record(stats, page_number, *result)
+            if len(results) < len(shard):
+                _timed_out(stats, shard[len(results):], "deadline")
+                done += len(shard) - len(results)
+        return
+    except BrokenProcessPool:
+        shutdown_pool()
+    finally:
+        for fut in futures:
+            fut.cancel()
+
+    # The pool died under us; finish the remaining pages in-process.
+    remaining = selected[done:]
+    if not remaining:
+        return
+    with pdfplumber.open(source, pages=remaining) as pdf:
+        for i, page in enumerate(pdf.pages):
+            if _expired(deadline):
+                _timed_out(stats, remaining[i:], "deadline")
+                return
+            yield page.page_number, _record(stats, page.page_number, *_process_page(page, **page_options))
+
+
+def iter_extract_tables(source, workers=None, shard_pages=None, stats=None, *, dedupe=False, **options):
+    """Yield ``(page_number, tables)`` for every selected page, in page order.
+
+    ``source`` is a path or a seekable binary stream. Each table is a list
+    of rows with ``None`` cells replaced by ``""``. ``pages`` is a list of
+    ranges from :func:`parse_page_spec`; ``profile`` names the
+    :data:`PROFILES` entry to use (default ``EXTRACT_PROFILE``);
+    ``prescan`` skips pages the profile cannot find a table on before
+    running the table finder (they yield no tables) and defaults to the
+    profile's own setting.
+    Scanned pages (no text, mostly image) are counted in
+    ``stats["pages_scanned"]`` and, when Tesseract is installed, read
+    with OCR (see :mod:`ocr`) unless ``use_ocr=False``.
+    ``layout_key`` (a stored document's id, see :mod:`documents`) keeps
+    each page's parsed objects in :data:`documents.layouts` and reuses them
+    on later calls with the same key, skipping the layout analysis.
+    ``low_memory`` also drops pdfminer's object cache after every page, and
+    ``memory_limit`` (bytes, default ``EXTRACT_MEMORY_LIMIT_MB``) raises
+    :class:`MemoryLimitExceeded` once the process has grown by more than
+    that since the extraction started. It is measured on the whole
+    process's RSS (the pool worker's, for pages extracted there), so
+    concurrent requests in one worker count against each other's limits.
+
+    ``deadline`` is a ``time.monotonic()`` value checked between pages:
+    once it has passed, the remaining pages are not extracted.
+    ``page_timeout`` (seconds, default ``EXTRACT_PAGE_TIMEOUT``) runs the
+    pages in a child process that is killed when one page takes longer;
+    that page is given up on and extraction carries on with the next one.
+    Pages lost either way are not yielded; they are listed in
+    ``stats["timed_out_pages"]`` and ``stats["partial"]`` is set.
+
+    ``dedupe`` merges tables that continue across pages under a repeated
+    header and drops the repeats and page furniture (see
+    :func:`dedupe.merge_pages`); the logical tables are described in
+    ``stats["tables"]``.
+
+    If ``stats`` is given it is filled in as pages are processed;
+    ``stats["pages_total"]`` (pages selected) is set before the first page.
+    """
+    stats = {} if stats is None else stats
+    pages = _iter_pages(source, workers, shard_pages, stats, **options)
+    if not dedupe:
+        return pages
+    stats["tables"] = []
+    return merge_pages(pages, stats["tables"])
+
+
+def extract_tables(source, workers=None, shard_pages=None, stats=None, **options):
+    """All rows of every table, in order, as a :class:`rows.RowStore`."""
+    rows = RowStore()
+    for _, tables in iter_extract_tables(source, workers, shard_pages, stats, **options):
+        for tbl in tables:
+            rows.extend(tbl)
+    return rows
+
+
+def _extract_document(source, options):
+    # Runs in a pool worker for batch requests: one whole document per task.
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return extract_tables(source, workers=1, **options)
+
+
+def iter_extract_documents(loaders, workers=None, **options):
+    """Extract whole documents, yielding ``(index, rows, error)`` as each one
+    finishes, in completion order.
+
+    ``loaders`` are callables returning a path or the PDF bytes. They are
+    called lazily so only a couple of documents per worker are in memory.
+    """
+    workers = EXTRACT_WORKERS if workers is None else workers
+    if workers <= 1:
+        for index, load in enumerate(loaders):
+            try:
+                yield index, _extract_document(load(), options), None
+            except Exception as e:
+                yield index, None, e
+        return
+
+    pool = get_pool()
+    todo = list(enumerate(loaders))
+    todo.reverse()
+    pending = {}
+    try:
+        while todo or pending:
+            while todo and len(pending) < workers * 2:
+                index, load = todo.pop()
+                try:
+                    pending[pool.submit(_extract_document, load(), options)] = index
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    yield index, None, e
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                index = pending.pop(fut)
+                try:
+                    yield index, fut.result(), None
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    yield index, None, e
+    except BrokenProcessPool:
+        shutdown_pool()
+        raise
+    finally:
+        for fut in pending:
+            fut.cancel()
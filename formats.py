@@ -0,0 +1,76 @@
+import io
+import json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: arrow/parquet output is disabled without it
+    pa = None
+    pq = None
+
+
+class FormatUnavailable(Exception):
+    pass
+
+
+def check_available(output):
+    if output in ("arrow", "parquet") and pa is None:
+        raise FormatUnavailable(f"{output} output needs pyarrow, which is not installed")
+
+
+def _width(rows):
+    return max((len(r) for r in rows), default=0)
+
+
+def columnar_json(tables):
+    """One entry per table, with its cells transposed into column arrays."""
+    out = []
+    for page, index, rows in tables:
+        width = _width(rows)
+        columns = [[r[c] if c < len(r) else "" for r in rows] for c in range(width)]
+        out.append({"page": page, "table": index, "rows": len(rows), "width": width, "columns": columns})
+    return json.dumps({"tables": out}, separators=(",", ":")).encode("utf-8")
+
+
+def _arrow_table(tables):
+    width = max((_width(rows) for _, _, rows in tables), default=0)
+    pages, indexes, row_numbers = [], [], []
+    columns = [[] for _ in range(width)]
+    for page, index, rows in tables:
+        for n, r in enumerate(rows):
+            pages.append(page)
+            indexes.append(index)
+            row_numbers.append(n)
+            for c in range(width):
+                columns[c].append(r[c] if c < len(r) else "")
+    arrays = [
+        pa.array(pages, pa.int32()),
+        pa.array(indexes, pa.int32()),
+        pa.array(row_numbers, pa.int32()),
+    ] + [pa.array(col, pa.string()) for col in columns]
+    names = ["page", "table", "row"] + [f"c{c}" for c in range(width)]
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def arrow_ipc(tables):
+    table = _arrow_table(tables)
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def parquet(tables):
+    table = _arrow_table(tables)
+    buf = io.BytesIO()
+    pq.write_table(table, buf, compression="zstd", use_dictionary=True)
+    return buf.getvalue()
+
+
+# output name -> (renderer, mimetype, download filename)
+TABLE_FORMATS = {
+    "columnar": (columnar_json, "application/json", None),
+    "arrow": (arrow_ipc, "application/vnd.apache.arrow.stream", "extracted.arrows"),
+    "parquet": (parquet, "application/vnd.apache.parquet", "extracted.parquet"),
+}
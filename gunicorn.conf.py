@@ -0,0 +1,16 @@
+import os
+
+# Import the app (and run warmup.py) once in the master; workers fork with
+# pdfplumber, the font metrics and CMaps already in memory.
+preload_app = True
+
+# Threads per worker, so admission control (admission.py) can run a small
+# request next to a large one instead of leaving it in the accept queue.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+
+
+def post_fork(server, worker):
+    import warmup
+
+    warmup.warm_worker()
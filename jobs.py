@@ -0,0 +1,195 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import disk
+
+JOBS_DIR = os.environ.get("JOBS_DIR", os.path.join(tempfile.gettempdir(), "pdf2csvhub-jobs"))
+# Jobs running at once in this process.
+JOBS_CONCURRENCY = int(os.environ.get("JOBS_CONCURRENCY", "2"))
+# Queued plus running jobs accepted by this process before answering 429.
+JOBS_MAX_PENDING = int(os.environ.get("JOBS_MAX_PENDING", "16"))
+# Finished jobs, and their results, are deleted after this many seconds.
+JOBS_TTL_SECONDS = int(os.environ.get("JOBS_TTL_SECONDS", "3600"))
+
+# Status files are rewritten at most this often while a job is running.
+_PROGRESS_INTERVAL = 0.5
+_SWEEP_INTERVAL = 60
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _valid_id(job_id):
+    return len(job_id) == 32 and all(c in "0123456789abcdef" for c in job_id)
+
+
+class JobQueue:
+    """Bounded local job runner with status and results kept on disk.
+
+    State lives in ``<jobs_dir>/<id>/`` so any gunicorn worker can answer
+    status and result requests, whichever worker ran the job.
+    """
+
+    def __init__(self, runner, jobs_dir=JOBS_DIR, concurrency=JOBS_CONCURRENCY,
+                 max_pending=JOBS_MAX_PENDING, ttl=JOBS_TTL_SECONDS):
+        # runner(input_path, options, progress) -> (body, mimetype, headers)
+        self.runner = runner
+        # offload(job_id, input_path, status) runs execute() with those
+        # arguments somewhere else, such as another process, and returns
+        # when it is done; None runs jobs in this process's job threads.
+        self.offload = None
+        self.jobs_dir = jobs_dir
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_sweep = 0.0
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def submit(self, save_input, options):
+        self.sweep()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull()
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        job_dir = self._job_dir(job_id)
+        try:
+            os.makedirs(job_dir)
+            input_path = os.path.join(job_dir, "input.pdf")
+            save_input(input_path)
+            status = {
+                "id": job_id,
+                "status": "queued",
+                "pages_done": 0,
+                "pages_total": None,
+                "created_at": time.time(),
+                "finished_at": None,
+                "error": None,
+                "options": options,
+            }
+            self._write_status(job_id, status)
+            self._executor.submit(self._run, job_id, input_path, dict(status))
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        return status
+
+    def status(self, job_id):
+        # Reads sweep too, so a queue nobody submits to still expires jobs,
+        # and an expired job is never served while it waits for a sweep.
+        self.sweep()
+        status = self._read_status(job_id)
+        if status is not None and self._expired(status, time.time()):
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+            return None
+        return status
+
+    def result_path(self, job_id):
+        return os.path.join(self._job_dir(job_id), "result")
+
+    def sweep(self):
+        now = time.time()
+        if now - self._last_sweep < _SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        try:
+            names = os.listdir(self.jobs_dir)
+        except OSError:
+            return
+        for name in names:
+            status = self._read_status(name)
+            if status is not None and self._expired(status, now):
+                shutil.rmtree(self._job_dir(name), ignore_errors=True)
+
+    def _expired(self, status, now):
+        # Unfinished jobs are kept too long to be alive only if their
+        # worker died; reap them on the same clock.
+        since = status["finished_at"] or status["created_at"]
+        return now - since > self.ttl
+
+    def _read_status(self, job_id):
+        if not _valid_id(job_id):
+            return None
+        try:
+            with open(os.path.join(self._job_dir(job_id), "status.json")) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def _write_status(self, job_id, status):
+        path = os.path.join(self._job_dir(job_id), "status.json")
+        disk.write_atomic(path, json.dumps(status).encode("utf-8"))
+
+    def _run(self, job_id, input_path, status):
+        try:
+            if self.offload is None:
+                self.execute(job_id, input_path, status)
+            else:
+                self.offload(job_id, input_path, status)
+        except Exception as e:
+            # Whatever ran the job died before it could record the outcome.
+            status["status"] = "failed"
+            status["error"] = str(e) or e.__class__.__name__
+            status["finished_at"] = time.time()
+            try:
+                self._write_status(job_id, status)
+            except OSError:
+                pass
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def execute(self, job_id, input_path, status):
+        """Run a submitted job to completion, recording progress, the
+        result and the final status in its directory."""
+        last_write = [0.0]
+
+        def progress(pages_done, pages_total):
+            status["pages_done"] = pages_done
+            status["pages_total"] = pages_total
+            now = time.monotonic()
+            if now - last_write[0] >= _PROGRESS_INTERVAL:
+                last_write[0] = now
+                self._write_status(job_id, status)
+
+        try:
+            status["status"] = "running"
+            self._write_status(job_id, status)
+            body, mimetype, headers = self.runner(input_path, status["options"], progress)
+            with open(self.result_path(job_id), "wb") as fh:
+                fh.write(body)
+            status["status"] = "done"
+            status["mimetype"] = mimetype
+            status["headers"] = headers
+        except Exception as e:
+            status["status"] = "failed"
+            status["error"] = str(e) or e.__class__.__name__
+        finally:
+            status["finished_at"] = time.time()
+            try:
+                os.unlink(input_path)
+            except OSError:
+                pass
+            try:
+                self._write_status(job_id, status)
+            except OSError:
+                pass
@@ -0,0 +1,226 @@
+import json
+import os
+import resource
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import disk
+
+# Every worker process writes its metrics here so /metrics can add them up
+# across gunicorn workers. Empty keeps metrics in-process only.
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), "pdf2csvhub-metrics"))
+# Minimum seconds between two snapshot writes from the same process.
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "1"))
+
+PREFIX = "pdf2csvhub_"
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+BYTES_BUCKETS = tuple(float(mb * 1024 * 1024) for mb in (32, 64, 128, 256, 512, 1024, 2048, 4096))
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {}
+_collectors = []
+_last_flush = 0.0
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items())) if labels else ()
+
+
+def describe(name, text):
+    _help[name] = text
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=TIME_BUCKETS, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"buckets": list(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(hist["buckets"]):
+            if value <= bound:
+                hist["counts"][i] += 1
+                break
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+def register_collector(fn):
+    # fn() -> {metric_name: value}, summed across workers. Names ending in
+    # _total are exposed as counters, everything else as gauges.
+    _collectors.append(fn)
+
+
+@contextmanager
+def timed(stage, timings=None):
+    """Time a block into the ``stage_seconds`` histogram (and ``timings``)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("stage_seconds", elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def server_timing(timings):
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def reset_peak_rss():
+    # Linux lets a process reset its own high-water mark, which turns VmHWM
+    # into a per-request peak for sync workers.
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _snapshot():
+    with _lock:
+        counters = [[name, list(labels), value] for (name, labels), value in _counters.items()]
+        histograms = [[name, list(labels), dict(hist, counts=list(hist["counts"]))]
+                      for (name, labels), hist in _histograms.items()]
+    gauges = {}
+    for fn in _collectors:
+        try:
+            gauges.update(fn())
+        except Exception:
+            pass
+    return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+
+def flush(force=False):
+    global _last_flush
+    if not METRICS_DIR:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < METRICS_FLUSH_INTERVAL:
+        return
+    _last_flush = now
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+        disk.write_atomic(path, json.dumps(_snapshot()).encode("utf-8"))
+    except OSError:
+        pass
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _load_snapshots():
+    if not METRICS_DIR:
+        return [_snapshot()]
+    flush(force=True)
+    snapshots = []
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            pid = int(name[:-5])
+        except ValueError:
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        if not _alive(pid):
+            # A worker that exited takes its counters with it, exactly like
+            # a process restart would; Prometheus handles the reset.
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as fh:
+                snapshots.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _labels(pairs, extra=()):
+    pairs = list(pairs) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render():
+    """Render all live workers' metrics in the Prometheus text format."""
+    counters = {}
+    histograms = {}
+    gauges = {}
+    for snap in _load_snapshots():
+        for name, labels, value in snap["counters"]:
+            key = (name, tuple(tuple(p) for p in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snap["histograms"]:
+            key = (name, tuple(tuple(p) for p in labels))
+            agg = histograms.get(key)
+            if agg is None:
+                histograms[key] = dict(hist, counts=list(hist["counts"]))
+                continue
+            agg["counts"] = [a + b for a, b in zip(agg["counts"], hist["counts"])]
+            agg["sum"] += hist["sum"]
+            agg["count"] += hist["count"]
+        for name, value in snap["gauges"].items():
+            gauges[name] = gauges.get(name, 0) + value
+
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name in seen:
+            return
+        seen.add(name)
+        if name in _help:
+            lines.append(f"# HELP {PREFIX}{name} {_help[name]}")
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+    for (name, labels), hist in sorted(histograms.items()):
+        header(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(hist["buckets"], hist["counts"]):
+            cumulative += count
+            lines.append(f"{PREFIX}{name}_bucket{_labels(labels, [('le', repr(float(bound)))])} {cumulative}")
+        lines.append(f"{PREFIX}{name}_bucket{_labels(labels, [('le', '+Inf')])} {hist['count']}")
+        lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {hist['sum']}")
+        lines.append(f"{PREFIX}{name}_count{_labels(labels)} {hist['count']}")
+    for name, value in sorted(gauges.items()):
+        header(name, "counter" if name.endswith("_total") else "gauge")
+        lines.append(f"{PREFIX}{name} {value}")
+    return "\n".join(lines) + "\n"
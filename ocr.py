@@ -0,0 +1,154 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import disk
+import metrics
+
+# Tesseract (or anything with the same command line) run per scanned page.
+# OCR is skipped, and scanned pages only reported, if it is not on PATH.
+OCR_COMMAND = os.environ.get("OCR_COMMAND", "tesseract")
+OCR_LANG = os.environ.get("OCR_LANG", "eng")
+OCR_DPI = int(os.environ.get("OCR_DPI", "300"))
+# OCR processes running at once in this worker, whatever the request count.
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "2"))
+OCR_TIMEOUT = float(os.environ.get("OCR_TIMEOUT", "120"))
+# Recognised pages keyed by image hash, shared by every worker on the box.
+# Empty disables the cache.
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pdf2csvhub-ocr"))
+# A page with no text whose images cover at least this share of it is
+# treated as scanned.
+OCR_MIN_IMAGE_FRACTION = float(os.environ.get("OCR_MIN_IMAGE_FRACTION", "0.5"))
+# Words further apart than this (points) on one line start a new cell.
+OCR_COLUMN_GAP = float(os.environ.get("OCR_COLUMN_GAP", "12"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def available():
+    return shutil.which(OCR_COMMAND) is not None
+
+
+def is_scanned(page):
+    objects = page.objects
+    if objects.get("char"):
+        return False
+    images = objects.get("image", ())
+    if not images:
+        return False
+    page_area = float(page.width * page.height) or 1.0
+    covered = sum(max(img["x1"] - img["x0"], 0) * max(img["bottom"] - img["top"], 0) for img in images)
+    return covered / page_area >= OCR_MIN_IMAGE_FRACTION
+
+
+def image_key(page):
+    """Hash of the page's image data, size and the OCR settings."""
+    h = hashlib.sha256()
+    h.update(json.dumps([OCR_LANG, OCR_DPI, OCR_COLUMN_GAP, round(page.width, 1), round(page.height, 1)]).encode())
+    for img in sorted(page.objects.get("image", ()), key=lambda i: (i["top"], i["x0"])):
+        box = [round(img[k], 1) for k in ("x0", "top", "x1", "bottom")]
+        h.update(json.dumps(box).encode())
+        try:
+            h.update(img["stream"].get_rawdata() or b"")
+        except Exception:
+            pass
+    return h.hexdigest()
+
+
+def render(page):
+    buf = io.BytesIO()
+    page.to_image(resolution=OCR_DPI).original.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _cache_path(key):
+    return os.path.join(OCR_CACHE_DIR, key[:2], key + ".json")
+
+
+def cached(key):
+    if not OCR_CACHE_DIR:
+        return None
+    try:
+        with open(_cache_path(key)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _store(key, tables):
+    if not OCR_CACHE_DIR:
+        return
+    path = _cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        disk.write_atomic(path, json.dumps(tables).encode("utf-8"))
+    except OSError:
+        pass
+
+
+def _rows_from_tsv(tsv):
+    # Tesseract's TSV has one record per word with its line and pixel box;
+    # a line becomes a row and wide gaps between words split it into cells.
+    gap = OCR_COLUMN_GAP * OCR_DPI / 72
+    lines = {}
+    for rec in csv.DictReader(io.StringIO(tsv), delimiter="\t", quoting=csv.QUOTE_NONE):
+        text = (rec.get("text") or "").strip()
+        if rec.get("level") != "5" or not text:
+            continue
+        line = (int(rec["block_num"]), int(rec["par_num"]), int(rec["line_num"]))
+        lines.setdefault(line, []).append((int(rec["left"]), int(rec["left"]) + int(rec["width"]), text))
+    rows = []
+    for line in sorted(lines):
+        cells = []
+        end = None
+        for left, right, text in sorted(lines[line]):
+            if end is not None and left - end <= gap:
+                cells[-1] += " " + text
+            else:
+                cells.append(text)
+            end = right
+        rows.append(cells)
+    return rows
+
+
+def recognize(key, png):
+    """OCR one rendered page into ``[rows]`` (or ``[]``) and cache it."""
+    try:
+        proc = subprocess.run(
+            [OCR_COMMAND, "stdin", "stdout", "-l", OCR_LANG, "--dpi", str(OCR_DPI), "tsv"],
+            input=png,
+            capture_output=True,
+            timeout=OCR_TIMEOUT,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        metrics.inc("ocr_pages_total", outcome="error")
+        return []
+    rows = _rows_from_tsv(proc.stdout.decode("utf-8", "replace"))
+    tables = [rows] if rows else []
+    _store(key, tables)
+    metrics.inc("ocr_pages_total", outcome="recognised")
+    return tables
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+        return _pool
+
+
+def run(key, png):
+    # OCR waits its turn in a pool of its own, so a burst of scans queues
+    # there instead of taking over the extraction processes.
+    with metrics.timed("ocr"):
+        return _get_pool().submit(recognize, key, png).result()
@@ -0,0 +1,202 @@
+"""Per-request profiling, off unless asked for.
+
+A request is profiled when it carries ``X-Profile: <PROFILE_TOKEN>``, when
+it is picked at ``PROFILE_SAMPLE_RATE``, or when it is still running after
+``PROFILE_SLOW_SECONDS``. The first two run cProfile for the whole request
+(a ``.pstats`` file) and sample its stack (a ``.collapsed`` file for
+flamegraph.pl or speedscope). A slow request is only sampled, from the
+moment it crosses the threshold. Every profiled request logs its per-page
+timings.
+
+Requests that are not profiled pay for one dictionary insert and, with the
+slow trigger on, a watchdog thread waking every ``PROFILE_WATCH_INTERVAL``.
+"""
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+import disk
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "pdf2csvhub-profiles"))
+# Secret for the X-Profile header; empty disables the header trigger.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+# Share of extraction requests profiled at random.
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+# Start sampling any extraction request still running after this many
+# seconds; 0 disables.
+PROFILE_SLOW_SECONDS = float(os.environ.get("PROFILE_SLOW_SECONDS", "0"))
+# Stack sampling period, and how often running requests are checked
+# against the slow threshold.
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_WATCH_INTERVAL = float(os.environ.get("PROFILE_WATCH_INTERVAL", "0.1"))
+# Profiles kept on disk; the oldest are deleted.
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "200"))
+
+log = logging.getLogger("pdf2csvhub.profile")
+if not log.handlers:
+    # Nothing else in the app configures logging; profiles go to stderr.
+    log.addHandler(logging.StreamHandler())
+    log.setLevel(logging.INFO)
+
+_lock = threading.Lock()
+# Thread id -> Session being sampled, and thread id -> (start, endpoint)
+# for requests watched by the slow trigger.
+_sampling = {}
+_watched = {}
+_wake = threading.Event()
+_thread = None
+
+
+class Session:
+    def __init__(self, endpoint, trigger, profile=True, started=None):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{uuid.uuid4().hex[:8]}"
+        self.endpoint = endpoint
+        self.trigger = trigger
+        self.started = time.perf_counter() if started is None else started
+        self.samples = Counter()
+        self.pages = []
+        self.profiler = cProfile.Profile() if profile else None
+
+
+def _frame_name(code):
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample(frames):
+    with _lock:
+        active = list(_sampling.items())
+    for tid, session in active:
+        frame = frames.get(tid)
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            session.samples[";".join(reversed(stack))] += 1
+
+
+def _watch(now):
+    with _lock:
+        slow = [tid for tid, (start, _) in _watched.items() if now - start >= PROFILE_SLOW_SECONDS]
+        for tid in slow:
+            start, endpoint = _watched.pop(tid)
+            _sampling[tid] = Session(endpoint, "slow", profile=False, started=start)
+
+
+def _run():
+    last_watch = 0.0
+    while True:
+        with _lock:
+            busy = bool(_sampling)
+            watching = bool(_watched)
+        if not busy and not watching:
+            _wake.wait()
+            _wake.clear()
+            continue
+        now = time.perf_counter()
+        if watching and now - last_watch >= PROFILE_WATCH_INTERVAL:
+            _watch(now)
+            last_watch = now
+        if busy:
+            _sample(sys._current_frames())
+            time.sleep(PROFILE_SAMPLE_INTERVAL)
+        else:
+            time.sleep(PROFILE_WATCH_INTERVAL)
+
+
+def _ensure_thread():
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _thread = threading.Thread(target=_run, name="profiler", daemon=True)
+        _thread.start()
+
+
+def _requested(headers):
+    if PROFILE_TOKEN and hmac.compare_digest(headers.get("X-Profile", ""), PROFILE_TOKEN):
+        return "header"
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def begin(endpoint, headers):
+    """Start profiling the current request if it is asked for; returns the
+    profile id or None. Pair with :func:`end` in the same thread."""
+    trigger = _requested(headers)
+    tid = threading.get_ident()
+    if trigger is None:
+        if PROFILE_SLOW_SECONDS > 0:
+            with _lock:
+                _watched[tid] = (time.perf_counter(), endpoint)
+            _ensure_thread()
+            _wake.set()
+        return None
+    session = Session(endpoint, trigger)
+    with _lock:
+        _sampling[tid] = session
+    _ensure_thread()
+    _wake.set()
+    session.profiler.enable()
+    return session.id
+
+
+def record_page(page_number, seconds):
+    """Per-page timing for the request being profiled on this thread."""
+    if not _sampling:
+        return
+    with _lock:
+        session = _sampling.get(threading.get_ident())
+    if session is not None:
+        session.pages.append((page_number, round(seconds, 4)))
+
+
+def end():
+    """Finish the current request's profile, if any, and write it out."""
+    tid = threading.get_ident()
+    with _lock:
+        _watched.pop(tid, None)
+        session = _sampling.pop(tid, None)
+    if session is None:
+        return None
+    if session.profiler is not None:
+        session.profiler.disable()
+    elapsed = time.perf_counter() - session.started
+    try:
+        paths = _write(session)
+    except OSError:
+        log.exception("could not write profile %s", session.id)
+        return None
+    log.info(
+        "profiled %s (%s) in %.3fs: %s; pages %s",
+        session.endpoint, session.trigger, elapsed, ", ".join(paths), json.dumps(session.pages),
+    )
+    return session.id
+
+
+def _write(session):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, session.id)
+    paths = []
+    if session.samples:
+        with open(base + ".collapsed", "w") as fh:
+            for stack, count in session.samples.most_common():
+                fh.write(f"{stack} {count}\n")
+        paths.append(base + ".collapsed")
+    if session.profiler is not None:
+        session.profiler.dump_stats(base + ".pstats")
+        paths.append(base + ".pstats")
+    with open(base + ".json", "w") as fh:
+        json.dump({"endpoint": session.endpoint, "trigger": session.trigger, "pages": session.pages}, fh)
+    paths.append(base + ".json")
+    disk.prune_lru(PROFILE_DIR, max_entries=PROFILE_KEEP, suffixes=(".json", ".collapsed", ".pstats"))
+    return paths
+
@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+from array import array
+from collections.abc import Sequence
+from json.encoder import encode_basestring_ascii
+
+
+class RowStore(Sequence):
+    """Extracted rows in one flat list of cells plus row offsets.
+
+    Equal cell strings are stored once and the widest row is tracked as
+    rows are appended, so the writers below pad rows on the fly instead of
+    building a padded copy. Indexing and iteration give each row as a list.
+    """
+
+    __slots__ = ("cells", "offsets", "width", "_strings")
+
+    def __init__(self, rows=()):
+        self.cells = []
+        self.offsets = array("q", [0])
+        self.width = 0
+        self._strings = {}
+        self.extend(rows)
+
+    def append(self, row):
+        strings = self._strings
+        self.cells.extend([strings.setdefault(cell, cell) for cell in row])
+        self.offsets.append(len(self.cells))
+        if len(row) > self.width:
+            self.width = len(row)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("row index out of range")
+        return self.cells[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        cells = self.cells
+        offsets = self.offsets
+        for i in range(len(offsets) - 1):
+            yield cells[offsets[i]:offsets[i + 1]]
+
+    def __reduce__(self):
+        # Pool workers send results back pickled; the string table is
+        # rebuilt rather than sent twice.
+        return RowStore, (list(self),)
+
+    def write_csv(self, fh):
+        """Write every row to ``fh`` as CSV, padded to the widest row."""
+        writer = csv.writer(fh)
+        width = self.width
+        pads = [[""] * n for n in range(width + 1)]
+        for row in self:
+            if len(row) < width:
+                row += pads[width - len(row)]
+            writer.writerow(row)
+
+    def csv_bytes(self):
+        buf = io.StringIO()
+        self.write_csv(buf)
+        return buf.getvalue().encode("utf-8")
+
+    def json_rows(self):
+        """Yield every row as a compact JSON array, as bytes.
+
+        Every distinct cell string is encoded once.
+        """
+        encoded = {}
+        for cell in self._strings:
+            text = encode_basestring_ascii(cell) if isinstance(cell, str) else json.dumps(cell)
+            encoded[cell] = text.encode("ascii")
+        for row in self:
+            yield b"[" + b",".join([encoded[cell] for cell in row]) + b"]"
+
+    def json_bytes(self, **fields):
+        """A compact JSON object with the rows (unpadded) under ``"data"``
+        followed by ``fields``, built without a list-of-lists copy."""
+        out = io.BytesIO()
+        out.write(b'{"data":[')
+        sep = b""
+        for row in self.json_rows():
+            out.write(sep)
+            out.write(row)
+            sep = b","
+        if fields:
+            rest = json.dumps(fields, sort_keys=True, separators=(",", ":"))
+            out.write(b"]," + rest[1:].encode("ascii") + b"\n")
+        else:
+            out.write(b"]}\n")
+        return out.getvalue()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+import pytest
+
+# Keep the suite away from the shared on-disk caches and state under the
+# system temp directory; everything goes to a throwaway directory instead.
+_STATE = tempfile.mkdtemp(prefix="pdf2csvhub-tests-")
+for _name in ("DOCUMENTS_DIR", "JOBS_DIR", "OCR_CACHE_DIR", "PROFILE_DIR"):
+    os.environ.setdefault(_name, os.path.join(_STATE, _name.lower()))
+os.environ.setdefault("RESULT_CACHE_BYTES", "0")
+os.environ.setdefault("RESULT_CACHE_DIR", "")
+os.environ.setdefault("METRICS_DIR", "")
+os.environ.setdefault("ARTIFACTS_DIR", "")
+
+from app import app as flask_app  # noqa: E402
+from bench.pdfgen import document  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return flask_app.test_client()
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """Write a generated PDF (see bench.pdfgen.document) and return its path."""
+
+    def make(kind="ruled", pages=1, rows=10, cols=4):
+        path = tmp_path / f"{kind}-{pages}.pdf"
+        path.write_bytes(document(kind, pages, rows, cols))
+        return str(path)
+
+    return make
+
+
+def post_extract(client, path, headers=None, **fields):
+    with open(path, "rb") as fh:
+        return client.post(
+            "/extract",
+            data={"file": (fh, "test.pdf"), **fields},
+            headers=headers or {},
+            content_type="multipart/form-data",
+        )
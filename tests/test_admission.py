@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+
+import admission
+from admission import Admission, Overloaded
+from tests.conftest import post_extract
+
+
+def test_small_requests_do_not_wait_behind_large_ones():
+    controller = Admission(capacity=10, small_cost=2, small_reserve=2, wait_seconds=0.05)
+    large = controller.acquire(8)
+    with pytest.raises(Overloaded) as shed:
+        controller.acquire(4)
+    assert (shed.value.lane, shed.value.reason) == ("large", "timeout")
+    small = controller.acquire(2)
+    assert small.lane == "small"
+    large.release()
+    small.release()
+    assert controller.snapshot()["in_flight"] == {"small": 0.0, "large": 0.0}
+
+
+def test_release_admits_the_next_waiter():
+    controller = Admission(capacity=10, small_cost=2, small_reserve=2, wait_seconds=5)
+    first = controller.acquire(8)
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(controller.acquire(8)))
+    waiter.start()
+    while not controller.snapshot()["waiting"]["large"]:
+        time.sleep(0.01)
+    first.release()
+    waiter.join()
+    assert admitted[0].cost == 8
+
+
+def test_full_queue_is_shed_at_once():
+    controller = Admission(capacity=4, small_cost=1, small_reserve=1, wait_seconds=5, max_waiting=0)
+    controller.acquire(4)
+    with pytest.raises(Overloaded) as shed:
+        controller.acquire(4)
+    assert shed.value.reason == "queue_full"
+    assert shed.value.retry_after >= 1
+
+
+def test_overloaded_extract_is_a_429(client, make_pdf, monkeypatch):
+    controller = Admission(capacity=2, small_cost=5, small_reserve=2, wait_seconds=5, max_waiting=0)
+    monkeypatch.setattr(admission, "controller", controller)
+    held = controller.acquire(2)
+    resp = post_extract(client, make_pdf())
+    assert resp.status_code == 429
+    assert resp.get_json()["reason"] == "queue_full"
+    assert int(resp.headers["Retry-After"]) >= 1
+    held.release()
+    assert post_extract(client, make_pdf()).status_code == 200
+
+
+def test_estimate_counts_pages_and_bytes():
+    assert admission.estimate(0, 0) == 1.0
+    assert admission.estimate(10, admission.ADMISSION_BYTES_PER_UNIT * 2) == 12.0
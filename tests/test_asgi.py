@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import app as app_module
+from tests.conftest import post_extract
+
+BOUNDARY = "test-boundary"
+
+
+def multipart(fields, files):
+    parts = [
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ]
+    for name, (filename, body) in files.items():
+        parts.append(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/pdf\r\n\r\n".encode() + body + b"\r\n"
+        )
+    parts.append(f"--{BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+
+@pytest.fixture
+def asgi(monkeypatch):
+    # Importing asgi sends jobs to its processes; keep that to these tests.
+    monkeypatch.setattr(app_module.job_queue, "offload", app_module.job_queue.offload)
+    import asgi
+
+    monkeypatch.setattr(asgi, "ASGI_PROCESSES", 1)
+    yield asgi
+    asgi._shutdown_processes()
+    asgi._close_reply_socket()
+
+
+def call(asgi, method, path, body=b"", headers=None):
+    """Run one request through the ASGI app; returns (status, headers, body
+    chunks)."""
+    headers = headers or [(b"content-length", str(len(body)).encode())]
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": b"", "headers": headers,
+        "http_version": "1.1", "server": ("testserver", 80), "client": ("127.0.0.1", 1),
+    }
+    messages = []
+    received = []
+
+    async def receive():
+        if not received:
+            received.append(body)
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    start = messages[0]
+    chunks = [m["body"] for m in messages[1:] if m.get("body")]
+    return start["status"], dict(start["headers"]), chunks
+
+
+def post_pdf(asgi, path, **fields):
+    with open(path, "rb") as fh:
+        body = multipart(fields, {"file": ("test.pdf", fh.read())})
+    content_type = f"multipart/form-data; boundary={BOUNDARY}".encode()
+    headers = [(b"content-length", str(len(body)).encode()), (b"content-type", content_type)]
+    return call(asgi, "POST", "/extract", body, headers)
+
+
+def test_extract_runs_in_a_process(asgi, client, make_pdf):
+    path = make_pdf(pages=3)
+    status, headers, chunks = post_pdf(asgi, path)
+    assert status == 200
+    assert headers[b"content-type"].startswith(b"text/csv")
+    assert b"".join(chunks) == post_extract(client, path).get_data()
+
+
+def test_ndjson_is_relayed_as_it_streams(asgi, make_pdf):
+    status, _, chunks = post_pdf(asgi, make_pdf(pages=3), output="ndjson")
+    assert status == 200
+    assert len(chunks) >= 3
+    records = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert [r["page"] for r in records] == [1] * 10 + [2] * 10 + [3] * 10
+
+
+def test_cheap_routes_and_limits(asgi):
+    status, _, chunks = call(asgi, "GET", "/health")
+    assert status == 200
+    assert json.loads(b"".join(chunks))["pid"] == os.getpid()
+    status, _, chunks = call(asgi, "POST", "/extract", headers=[(b"content-length", str(2**40).encode())])
+    assert status == 413
+    assert json.loads(b"".join(chunks))["reason"] == "too_large"
@@ -0,0 +1,54 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from tests.conftest import post_extract
+
+
+def post_batch(client, files, **fields):
+    data = {"files": [(io.BytesIO(body), name) for name, body in files], **fields}
+    return client.post("/extract/batch", data=data, content_type="multipart/form-data")
+
+
+def read(path):
+    with open(path, "rb") as fh:
+        return fh.read()
+
+
+@pytest.fixture
+def paths(make_pdf):
+    return {"one": make_pdf(pages=1), "two": make_pdf(pages=2)}
+
+
+def test_zip_has_a_csv_per_file_and_a_manifest(client, paths):
+    resp = post_batch(client, [("a.pdf", read(paths["one"])), ("b.pdf", read(paths["two"])), ("c.pdf", b"nope")])
+    assert resp.mimetype == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(resp.get_data()))
+    manifest = json.loads(archive.read("manifest.json"))["files"]
+    assert [(e["file"], e.get("rows"), e.get("csv")) for e in manifest] == [
+        ("a.pdf", 10, "a.csv"),
+        ("b.pdf", 20, "b.csv"),
+        ("c.pdf", None, None),
+    ]
+    assert "error" in manifest[2]
+    assert archive.read("b.csv") == post_extract(client, paths["two"]).get_data()
+
+
+def test_ndjson_and_zip_input(client, paths):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as inner:
+        inner.writestr("x/one.pdf", read(paths["one"]))
+        inner.writestr("notes.txt", "skipped")
+        inner.writestr("x/two.pdf", read(paths["two"]))
+    resp = post_batch(client, [("docs.zip", buf.getvalue())], output="ndjson")
+    records = sorted((json.loads(line) for line in resp.get_data(as_text=True).splitlines()), key=lambda r: r["index"])
+    assert [(r["file"], r["rows"]) for r in records] == [("x/one.pdf", 10), ("x/two.pdf", 20)]
+    assert records[1]["data"] == post_extract(client, paths["two"], output="json").get_json()["data"]
+
+
+def test_batch_rejects_bad_requests(client, paths):
+    assert client.post("/extract/batch", data={}, content_type="multipart/form-data").status_code == 400
+    assert post_batch(client, [("a.pdf", read(paths["one"]))], output="json").status_code == 400
+    assert post_batch(client, [("a.zip", b"PK\x03\x04broken")]).status_code == 400
@@ -0,0 +1,53 @@
+import pytest
+
+import app as app_module
+from cache import ResultCache, make_key
+from tests.conftest import post_extract
+
+
+def test_key_does_not_depend_on_option_order():
+    assert make_key("doc", output="csv", profile="default") == make_key("doc", profile="default", output="csv")
+
+
+@pytest.mark.parametrize("change", [{"output": "json"}, {"profile": "accurate"}, {"pages": "1-2"}, {"dedupe": True}])
+def test_key_changes_with_every_option(change):
+    options = {"output": "csv", "profile": "default"}
+    assert make_key("doc", **options) != make_key("doc", **{**options, **change})
+    assert make_key("doc", **options) != make_key("other", **options)
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path):
+    ResultCache(max_bytes=2**20, disk_dir=str(tmp_path)).put("k" * 64, b"body", "text/csv", {"X-A": "1"})
+    other = ResultCache(max_bytes=2**20, disk_dir=str(tmp_path))
+    assert other.get("k" * 64) == (b"body", "text/csv", {"X-A": "1"})
+    assert other.get("k" * 64) is not None
+    assert other.snapshot()["disk_hits"] == other.snapshot()["hits"] == 1
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_bytes=100, disk_dir="")
+    for key in "abcd":
+        cache.put(key, b"x" * 25, "text/csv")
+    cache.get("a")
+    cache.put("e", b"x" * 25, "text/csv")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.snapshot()["evictions"] == 1
+
+
+@pytest.fixture
+def result_cache(monkeypatch):
+    cache = ResultCache(max_bytes=2**20, disk_dir="")
+    monkeypatch.setattr(app_module, "result_cache", cache)
+    return cache
+
+
+def test_repeated_extract_is_a_hit(client, make_pdf, result_cache):
+    path = make_pdf(pages=2)
+    first = post_extract(client, path)
+    second = post_extract(client, path)
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert second.get_data() == first.get_data()
+    other = post_extract(client, path, output="json")
+    assert other.headers["X-Cache"] == "MISS"
+    assert result_cache.snapshot()["hits"] == 1
@@ -0,0 +1,18 @@
+import pytest
+
+from tests.conftest import post_extract
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", "0", "-1", "soon"])
+def test_deadline_must_be_a_positive_finite_number(client, make_pdf, value):
+    path = make_pdf()
+    resp = post_extract(client, path, deadline_seconds=value)
+    assert resp.status_code == 400
+    resp = post_extract(client, path, headers={"X-Deadline-Seconds": value})
+    assert resp.status_code == 400
+
+
+def test_finite_deadline_is_accepted(client, make_pdf):
+    resp = post_extract(client, make_pdf(), deadline_seconds="60", output="json")
+    assert resp.status_code == 200
+    assert resp.get_json()["rows"] == 10
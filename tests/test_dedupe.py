@@ -0,0 +1,34 @@
+from dedupe import merge_pages
+
+HEADER = ["name", "value"]
+FOOTER = ["continued overleaf", ""]
+
+
+def test_continued_table_is_merged():
+    pages = [
+        (1, [[HEADER, ["a", "1"], FOOTER]]),
+        (2, [[HEADER, ["b", "2"], FOOTER]]),
+        (3, [[HEADER, ["c", "3"]]]),
+        (4, []),
+        (5, [[HEADER, ["d", "4"]]]),
+    ]
+    tables = []
+    merged = list(merge_pages(iter(pages), tables))
+    assert merged == [
+        (1, [[HEADER, ["a", "1"]]]),
+        (2, [[["b", "2"]]]),
+        (3, [[["c", "3"]]]),
+        (4, []),
+        (5, [[HEADER, ["d", "4"]]]),
+    ]
+    # A page without tables ends the open one, so page 5 starts another.
+    assert [(t["first_page"], t["last_page"], t["rows"]) for t in tables] == [(1, 3, 4), (5, 5, 2)]
+    assert tables[0]["headers_removed"] == 2
+    assert tables[0]["footers_removed"] == 2
+
+
+def test_tables_without_a_repeated_header_stay_apart():
+    pages = [(1, [[["a", "1"], ["b", "2"]]]), (2, [[["c", "3"], ["d", "4"]]])]
+    tables = []
+    assert list(merge_pages(iter(pages), tables)) == pages
+    assert len(tables) == 2
@@ -0,0 +1,39 @@
+import io
+
+import pytest
+
+from tests.conftest import post_extract
+
+
+def test_json_rows(client, make_pdf):
+    body = post_extract(client, make_pdf(pages=2, rows=5, cols=3), output="json").get_json()
+    assert body["rows"] == 10
+    assert body["data"][0] == ["p0r0c0", "p0r0c1", "p0r0c2"]
+    assert body["data"][-1] == ["p1r4c0", "p1r4c1", "p1r4c2"]
+
+
+def test_json_without_tables(client, make_pdf):
+    body = post_extract(client, make_pdf(kind="whitespace"), output="json", profile="fast-ruled").get_json()
+    assert (body["rows"], body["data"]) == (0, [])
+
+
+def test_columnar_transposes_each_table(client, make_pdf):
+    body = post_extract(client, make_pdf(pages=2, rows=3, cols=2), output="columnar").get_json()
+    assert [(t["page"], t["rows"], t["width"]) for t in body["tables"]] == [(1, 3, 2), (2, 3, 2)]
+    assert body["tables"][1]["columns"] == [["p1r0c0", "p1r1c0", "p1r2c0"], ["p1r0c1", "p1r1c1", "p1r2c1"]]
+
+
+@pytest.mark.parametrize("output", ["arrow", "parquet"])
+def test_arrow_formats_round_trip(client, make_pdf, output):
+    pa = pytest.importorskip("pyarrow")
+    resp = post_extract(client, make_pdf(pages=2, rows=3, cols=2), output=output)
+    assert resp.status_code == 200
+    if output == "arrow":
+        table = pa.ipc.open_stream(resp.get_data()).read_all()
+    else:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(resp.get_data()))
+    columns = table.to_pydict()
+    assert columns["page"] == [1, 1, 1, 2, 2, 2]
+    assert columns["c0"][3:] == ["p1r0c0", "p1r1c0", "p1r2c0"]
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from tests.conftest import post_extract
+
+
+def submit_job(client, path, **fields):
+    with open(path, "rb") as fh:
+        resp = client.post("/jobs", data={"file": (fh, "test.pdf"), **fields}, content_type="multipart/form-data")
+    assert resp.status_code == 202
+    return resp.get_json()
+
+
+def wait_for(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/jobs/{job_id}").get_json()
+        if status["status"] in ("done", "failed"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def held_jobs(monkeypatch):
+    # Jobs wait for the event before they run, in this process.
+    release = threading.Event()
+    queue = app_module.job_queue
+
+    def offload(job_id, input_path, status):
+        if not release.wait(30):
+            raise RuntimeError("job was never released")
+        queue.execute(job_id, input_path, status)
+
+    monkeypatch.setattr(queue, "offload", offload)
+    yield release
+    release.set()
+
+
+def test_job_lifecycle(client, make_pdf, held_jobs):
+    path = make_pdf(pages=3)
+    job = submit_job(client, path)
+    assert job["status"] == "queued"
+    assert client.get(job["status_url"]).get_json()["status"] == "queued"
+    early = client.get(job["result_url"])
+    assert early.status_code == 409
+    assert early.get_json()["status"] == "queued"
+
+    held_jobs.set()
+    status = wait_for(client, job["id"])
+    assert status["status"] == "done"
+    assert status["pages_done"] == status["pages_total"] == 3
+    assert status["error"] is None
+    result = client.get(job["result_url"], headers={"Accept-Encoding": "identity"})
+    assert result.status_code == 200
+    assert result.mimetype == "text/csv"
+    assert result.get_data() == post_extract(client, path).get_data()
+
+
+def test_failed_job_reports_its_error(client, make_pdf, monkeypatch):
+    def offload(job_id, input_path, status):
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(app_module.job_queue, "offload", offload)
+    job = submit_job(client, make_pdf())
+    status = wait_for(client, job["id"])
+    assert (status["status"], status["error"]) == ("failed", "worker died")
+    assert client.get(job["result_url"]).status_code == 409
+
+
+@pytest.mark.parametrize("job_id", ["0" * 32, "../etc", "not-a-job"])
+def test_unknown_job_is_a_404(client, job_id):
+    assert client.get(f"/jobs/{job_id}").status_code == 404
+    assert client.get(f"/jobs/{job_id}/result").status_code == 404
+
+
+def test_expired_jobs_are_not_served(client, make_pdf, monkeypatch):
+    queue = app_module.job_queue
+    first, second = submit_job(client, make_pdf()), submit_job(client, make_pdf(pages=2))
+    for job in (first, second):
+        assert wait_for(client, job["id"])["status"] == "done"
+    monkeypatch.setattr(queue, "ttl", -1)
+    monkeypatch.setattr(queue, "_last_sweep", time.time())
+    # Expired on read, even before a sweep is due.
+    assert client.get(first["result_url"]).status_code == 404
+    assert not os.path.exists(os.path.join(queue.jobs_dir, first["id"]))
+    # A due sweep on read clears the rest without any new submission.
+    monkeypatch.setattr(queue, "_last_sweep", 0.0)
+    assert client.get("/jobs/" + "0" * 32).status_code == 404
+    assert not os.path.exists(os.path.join(queue.jobs_dir, second["id"]))
+
+
+def test_job_results_are_compressed(client, make_pdf):
+    path = make_pdf(pages=3, rows=40)
+    job = submit_job(client, path)
+    assert wait_for(client, job["id"])["status"] == "done"
+    plain = client.get(job["result_url"], headers={"Accept-Encoding": "identity"})
+    gzipped = client.get(job["result_url"], headers={"Accept-Encoding": "gzip"})
+    assert plain.status_code == gzipped.status_code == 200
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzipped.headers["ETag"] != plain.headers["ETag"]
+    assert plain.get_data() == post_extract(client, path).get_data()
@@ -0,0 +1,42 @@
+import itertools
+
+import pytest
+
+import extraction
+from tests.conftest import post_extract
+
+MiB = 2**20
+
+
+@pytest.fixture
+def rss(monkeypatch):
+    """Replace the process RSS with a sequence of readings in MiB: the
+    baseline first, then one per page; the last reading repeats."""
+
+    def use(*readings):
+        values = itertools.chain(readings, itertools.repeat(readings[-1]))
+        monkeypatch.setattr(extraction, "current_rss", lambda: next(values) * MiB)
+
+    return use
+
+
+def test_limit_counts_growth_not_the_idle_process(client, make_pdf, rss):
+    rss(500)
+    resp = post_extract(client, make_pdf(pages=3), memory_limit_mb="1", output="json")
+    assert resp.status_code == 200
+    assert resp.get_json()["rows"] == 30
+
+
+def test_limit_on_the_first_csv_chunk_is_a_507(client, make_pdf, rss):
+    rss(100, 300)
+    resp = post_extract(client, make_pdf(pages=3), memory_limit_mb="50", stream="1")
+    assert resp.status_code == 507
+    assert "memory limit exceeded on page 1" in resp.get_json()["error"]
+
+
+def test_limit_after_the_first_csv_chunk_ends_the_stream(client, make_pdf, rss):
+    rss(100, 100, 300)
+    resp = post_extract(client, make_pdf(pages=3), memory_limit_mb="50", stream="1")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/csv"
+    assert len(resp.data.decode().splitlines()) == 10
@@ -0,0 +1,28 @@
+import os
+
+import extraction
+
+
+def test_forked_child_does_not_use_the_parents_runners(make_pdf):
+    path = make_pdf(pages=2)
+    extraction.prestart_runner()
+    inherited = list(extraction._runners)
+    assert inherited
+    pid = os.fork()
+    if pid == 0:
+        # Child: report through the exit status; never return into pytest.
+        code = 1
+        try:
+            assert extraction._runners == []
+            stats = {}
+            rows = extraction.extract_tables(path, page_timeout=30, stats=stats)
+            assert len(rows) == 20 and not stats["partial"]
+            extraction._shutdown_runners()
+            code = 0
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    # The parent's runner is still its own and still alive.
+    assert all(runner.process.is_alive() for runner in inherited)
+    extraction._shutdown_runners()
@@ -0,0 +1,60 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import extraction
+
+
+@pytest.fixture
+def shard_calls(monkeypatch):
+    # Run shards in threads of this process and record what each was given.
+    calls = []
+    extract_shard = extraction._extract_shard
+
+    def record(source, page_numbers, *args):
+        calls.append((type(source), list(page_numbers)))
+        return extract_shard(source, page_numbers, *args)
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(extraction, "_extract_shard", record)
+    monkeypatch.setattr(extraction, "get_pool", lambda: pool)
+    yield calls
+    pool.shutdown()
+
+
+def test_in_memory_upload_is_sharded(make_pdf, shard_calls):
+    path = make_pdf(pages=10)
+    with open(path, "rb") as fh:
+        data = fh.read()
+    serial = extraction.extract_tables(io.BytesIO(data), workers=1)
+    parallel = extraction.extract_tables(io.BytesIO(data), workers=2)
+    assert [kind for kind, _ in shard_calls] == [bytes, bytes]
+    assert sorted(p for _, pages in shard_calls for p in pages) == list(range(1, 11))
+    assert list(parallel) == list(serial)
+
+
+def test_process_pool_matches_serial(make_pdf, monkeypatch):
+    monkeypatch.setattr(extraction, "EXTRACT_WORKERS", 2)
+    path = make_pdf(pages=12)
+    serial_stats, parallel_stats = {}, {}
+    serial = extraction.extract_tables(path, workers=1, stats=serial_stats)
+    try:
+        parallel = extraction.extract_tables(path, workers=2, shard_pages=5, stats=parallel_stats)
+    finally:
+        extraction.shutdown_pool()
+    assert len(serial) == 120
+    assert list(parallel) == list(serial)
+    assert parallel_stats["pages_done"] == serial_stats["pages_done"] == 12
+
+
+def test_batch_documents_in_the_pool(make_pdf, monkeypatch):
+    monkeypatch.setattr(extraction, "EXTRACT_WORKERS", 2)
+    paths = [make_pdf(pages=n) for n in (1, 2, 3)]
+    try:
+        results = list(extraction.iter_extract_documents([lambda p=p: p for p in paths], workers=2))
+    finally:
+        extraction.shutdown_pool()
+    assert sorted((index, len(rows), error) for index, rows, error in results) == [
+        (0, 10, None), (1, 20, None), (2, 30, None),
+    ]
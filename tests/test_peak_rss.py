@@ -0,0 +1,35 @@
+import threading
+
+from tests.conftest import post_extract
+
+
+def test_peak_rss_is_reported_for_a_request_running_alone(client, make_pdf):
+    resp = post_extract(client, make_pdf())
+    assert resp.status_code == 200
+    assert int(resp.headers["X-Peak-RSS"]) > 0
+
+
+def test_peak_rss_is_not_reported_for_overlapping_requests(client, make_pdf, monkeypatch):
+    import extraction
+
+    path = make_pdf()
+    started = threading.Event()
+    release = threading.Event()
+    extract = extraction.extract_tables
+
+    def slow(*args, **kwargs):
+        started.set()
+        release.wait(10)
+        return extract(*args, **kwargs)
+
+    monkeypatch.setattr("app.extract_tables", slow)
+    results = {}
+    first = threading.Thread(target=lambda: results.setdefault("first", post_extract(client, path)))
+    first.start()
+    assert started.wait(10)
+    monkeypatch.setattr("app.extract_tables", extract)
+    second = post_extract(client, path)
+    release.set()
+    first.join(10)
+    assert "X-Peak-RSS" not in second.headers
+    assert "X-Peak-RSS" not in results["first"].headers
@@ -0,0 +1,15 @@
+from extraction import extract_tables
+
+
+def test_prescan_keeps_pages_only_the_fallback_can_read(make_pdf):
+    path = make_pdf("whitespace", pages=2, rows=20, cols=6)
+    rows = extract_tables(path, profile="accurate")
+    assert len(rows) > 0
+    assert len(extract_tables(path, profile="accurate", prescan=True)) == len(rows)
+
+
+def test_prescan_still_skips_pages_without_rulings(make_pdf):
+    path = make_pdf("whitespace", pages=2, rows=20, cols=6)
+    stats = {}
+    assert len(extract_tables(path, profile="fast-ruled", prescan=True, stats=stats)) == 0
+    assert stats["pages_skipped"] == 2
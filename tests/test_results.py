@@ -0,0 +1,44 @@
+import pytest
+
+import app as app_module
+from artifacts import ArtifactStore
+from tests.conftest import post_extract
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path / "artifacts"))
+    monkeypatch.setattr(app_module, "artifact_store", store)
+    return store
+
+
+def test_encoded_responses_get_their_own_etag(client, make_pdf, artifacts):
+    path = make_pdf(pages=2, rows=40)
+    plain = post_extract(client, path, output="json", headers={"Accept-Encoding": "identity"})
+    gzipped = post_extract(client, path, output="json", headers={"Accept-Encoding": "gzip"})
+    assert plain.headers.get("Content-Encoding") is None
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert plain.headers["ETag"] != gzipped.headers["ETag"]
+    assert "Accept-Encoding" in gzipped.headers["Vary"]
+
+    location = plain.headers["Content-Location"]
+    download = client.get(location, headers={"Accept-Encoding": "gzip"})
+    assert download.headers.get("Content-Encoding") is None
+    assert download.headers["ETag"] == plain.headers["ETag"]
+
+    page = location + "?offset=0&limit=40"
+    plain_page = client.get(page, headers={"Accept-Encoding": "identity"})
+    gzipped_page = client.get(page, headers={"Accept-Encoding": "gzip"})
+    assert gzipped_page.headers["Content-Encoding"] == "gzip"
+    assert plain_page.headers["ETag"] != gzipped_page.headers["ETag"]
+
+    again = client.get(page, headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped_page.headers["ETag"]})
+    assert again.status_code == 304
+    again = client.get(page, headers={"Accept-Encoding": "identity", "If-None-Match": gzipped_page.headers["ETag"]})
+    assert again.status_code == 200
+
+
+def test_results_are_not_stored_by_default(client, make_pdf):
+    resp = post_extract(client, make_pdf(), output="json")
+    assert resp.status_code == 200
+    assert "ETag" not in resp.headers
@@ -0,0 +1,18 @@
+from bench.run import row_memory
+from rows import RowStore
+
+
+def test_rows_round_trip():
+    rows = [["a", "b"], ["a"], [], ["c", "a", "b"]]
+    store = RowStore(rows)
+    assert list(store) == rows
+    assert store[-1] == ["c", "a", "b"]
+    assert store.width == 3
+    assert store.csv_bytes() == b"a,b,\r\na,,\r\n,,\r\nc,a,b\r\n"
+    assert store.json_bytes(rows=4) == b'{"data":[["a","b"],["a"],[],["c","a","b"]],"rows":4}\n'
+
+
+def test_repeated_cells_take_less_memory_than_lists(make_pdf):
+    memory = row_memory(make_pdf(kind="tiny", pages=3, rows=24, cols=2))
+    assert memory["cells"] == 3 * 24 * 4
+    assert memory["rowstore_bytes_per_cell"] < memory["list_bytes_per_cell"] / 2
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import app as app_module
+from dedupe import merge_pages
+from tests.conftest import post_extract
+
+
+def ndjson_records(resp):
+    return [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+
+
+def test_streamed_csv_matches_the_buffered_body(client, make_pdf):
+    path = make_pdf(pages=3)
+    streamed = post_extract(client, path, stream="1")
+    assert streamed.is_streamed
+    assert streamed.mimetype == "text/csv"
+    assert streamed.get_data() == post_extract(client, path).get_data()
+
+
+def test_streamed_csv_pads_rows_to_width(client, make_pdf):
+    resp = post_extract(client, make_pdf(cols=3), stream="1", width="5")
+    lines = resp.get_data(as_text=True).splitlines()
+    assert len(lines) == 10
+    assert all(line.count(",") == 4 for line in lines)
+    assert post_extract(client, make_pdf(), stream="1", width="0").status_code == 400
+
+
+def test_ndjson_has_one_record_per_row(client, make_pdf):
+    resp = post_extract(client, make_pdf(pages=2, rows=5, cols=3), output="ndjson")
+    assert resp.mimetype == "application/x-ndjson"
+    records = ndjson_records(resp)
+    assert [r["page"] for r in records] == [1] * 5 + [2] * 5
+    assert records[0]["row"] == ["p0r0c0", "p0r0c1", "p0r0c2"]
+    assert records[-1]["row"] == ["p1r4c0", "p1r4c1", "p1r4c2"]
+
+
+@pytest.mark.parametrize("output", ["json", "columnar", "parquet"])
+def test_stream_needs_a_streamable_output(client, make_pdf, output):
+    resp = post_extract(client, make_pdf(), output=output, stream="1")
+    assert resp.status_code == 400
+    assert "stream" in resp.get_json()["error"]
+
+
+def test_ndjson_numbers_tables_across_the_document(client, make_pdf):
+    resp = post_extract(client, make_pdf(kind="tiny", pages=2, rows=3), output="ndjson")
+    records = ndjson_records(resp)
+    assert [(r["page"], r["table"]) for r in records[::2]] == [(1, 0), (1, 1), (1, 2), (2, 3), (2, 4), (2, 5)]
+
+
+def test_ndjson_continued_tables_keep_their_number(client, make_pdf, monkeypatch):
+    pages = [
+        (1, [[["a"], ["a1"]], [["b"], ["b1"]]]),
+        (2, [[["b"], ["b2"]], [["c"], ["c1"]]]),
+    ]
+
+    def merged(source, stats, **options):
+        stats["tables"] = []
+        return merge_pages(iter(pages), stats["tables"])
+
+    monkeypatch.setattr(app_module, "iter_extract_tables", merged)
+    records = ndjson_records(post_extract(client, make_pdf(), output="ndjson", dedupe="1"))
+    rows = [(r["page"], r["table"], r["row"]) for r in records if "row" in r]
+    assert rows == [
+        (1, 0, ["a"]), (1, 0, ["a1"]),
+        (1, 1, ["b"]), (1, 1, ["b1"]),
+        (2, 1, ["b2"]),
+        (2, 2, ["c"]), (2, 2, ["c1"]),
+    ]
+    assert [t["table"] for t in records[-1]["tables"]] == [0, 1, 2]
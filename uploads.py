@@ -0,0 +1,147 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+from flask import Request
+from pdfminer.pdfdocument import PDFDocument, PDFEncryptionError
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import PSException
+
+import metrics
+
+# Uploads up to this size stay in memory; larger ones spill to one named
+# temporary file that is parsed in place.
+UPLOAD_SPOOL_BYTES = int(os.environ.get("UPLOAD_SPOOL_BYTES", str(8 * 1024 * 1024)))
+
+# Request bodies larger than this are refused with 413 while they stream in
+# (0 disables). Batches carry many documents and get their own ceiling.
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "100"))
+MAX_BATCH_UPLOAD_MB = int(os.environ.get("MAX_BATCH_UPLOAD_MB", "1000"))
+# Documents with more pages than this are refused before extraction (0
+# disables).
+MAX_PAGES = int(os.environ.get("MAX_PAGES", "2000"))
+
+# Where the PDF header may start; some producers put junk in front of it.
+_HEADER_WINDOW = 1024
+
+_stats_lock = threading.Lock()
+upload_stats = {"memory": 0, "spooled": 0}
+rejected_stats = {}
+
+
+class UploadRejected(Exception):
+    """An upload refused by :func:`check_pdf` before any extraction."""
+
+    def __init__(self, reason, message, status):
+        super().__init__(message)
+        self.reason = reason
+        self.status = status
+
+
+def count_rejected(reason):
+    with _stats_lock:
+        rejected_stats[reason] = rejected_stats.get(reason, 0) + 1
+    metrics.inc("uploads_rejected_total", reason=reason)
+
+
+def _reject(reason, message, status):
+    count_rejected(reason)
+    raise UploadRejected(reason, message, status)
+
+
+def body_limit(endpoint):
+    """Largest accepted request body, in bytes, for ``endpoint`` (or None)."""
+    limit_mb = MAX_BATCH_UPLOAD_MB if endpoint == "extract_batch" else MAX_UPLOAD_MB
+    return limit_mb * 2**20 or None
+
+
+def _page_count(document):
+    pages = resolve1(document.catalog.get("Pages"))
+    count = resolve1(pages.get("Count")) if isinstance(pages, dict) else None
+    if isinstance(count, int) and count >= 0:
+        return count
+    # No usable /Count: walk the page tree, which still parses no content.
+    return sum(1 for _ in PDFPage.create_pages(document))
+
+
+def check_pdf(stream, max_pages=None):
+    """Check that ``stream`` holds a readable PDF and return its page count.
+
+    Only the header, the cross-reference table, the trailer and the page
+    tree root are read, so junk is refused in milliseconds instead of after
+    a full parse. Raises :class:`UploadRejected` with reason ``not_pdf``
+    (415), ``encrypted`` (a user password is needed; 422), ``malformed``
+    (no usable structure; 422) or ``too_many_pages`` (413, past
+    ``max_pages``, default ``MAX_PAGES``). Leaves ``stream`` at 0.
+    """
+    max_pages = MAX_PAGES if max_pages is None else max_pages
+    stream.seek(0)
+    head = stream.read(_HEADER_WINDOW)
+    stream.seek(0)
+    if b"%PDF-" not in head:
+        _reject("not_pdf", "not a PDF file", 415)
+    try:
+        document = PDFDocument(PDFParser(stream))
+        pages = _page_count(document)
+    except PDFEncryptionError:
+        _reject("encrypted", "PDF is password-protected", 422)
+    except (PSException, KeyError, TypeError, ValueError, AttributeError):
+        _reject("malformed", "PDF structure could not be read", 422)
+    finally:
+        stream.seek(0)
+    if max_pages and pages > max_pages:
+        _reject("too_many_pages", f"PDF has {pages} pages, at most {max_pages} are accepted", 413)
+    return pages
+
+
+class SpooledUpload(tempfile.SpooledTemporaryFile):
+    # Same as SpooledTemporaryFile, but rolls over into a *named* file so
+    # extraction pool workers can open the upload by path.
+    def rollover(self):
+        if self._rolled:
+            return
+        file = self._file
+        newfile = self._file = tempfile.NamedTemporaryFile(**self._TemporaryFileArgs)
+        del self._TemporaryFileArgs
+
+        pos = file.tell()
+        newfile.write(file.getvalue())
+        newfile.seek(pos, 0)
+
+        self._rolled = True
+
+
+class UploadRequest(Request):
+    @property
+    def max_content_length(self):
+        return body_limit(self.endpoint)
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledUpload(max_size=UPLOAD_SPOOL_BYTES, mode="w+b", suffix=".pdf")
+
+
+def open_upload(storage):
+    """Return ``(source, kind, sha256 hexdigest)`` for an uploaded file.
+
+    ``source`` is a seekable stream positioned at 0 that pdfplumber can read
+    directly; ``kind`` is ``"memory"`` or ``"spooled"``.
+    """
+    stream = storage.stream
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(64 * 1024), b""):
+        digest.update(chunk)
+    stream.seek(0)
+
+    if isinstance(stream, tempfile.SpooledTemporaryFile):
+        kind = "spooled" if stream._rolled else "memory"
+    else:
+        kind = "spooled" if isinstance(getattr(stream, "name", None), str) else "memory"
+    if kind == "spooled":
+        stream.flush()
+    with _stats_lock:
+        upload_stats[kind] += 1
+    return stream, kind, digest.hexdigest()
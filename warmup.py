@@ -0,0 +1,133 @@
+import io
+import os
+import threading
+import time
+
+from extraction import EXTRACT_PAGE_TIMEOUT, EXTRACT_WORKERS, extract_tables, get_pool, prestart_runner
+
+# off: skip; sync: warm up while the module is imported (before gunicorn
+# starts serving, and only once in the master with preload_app);
+# background: warm up in a thread while /ready reports 503.
+WARMUP = os.environ.get("WARMUP", "sync")
+# CMaps loaded up front; pdfminer otherwise unpickles them on first use.
+WARMUP_CMAPS = [
+    name.strip()
+    for name in os.environ.get("WARMUP_CMAPS", "UniJIS-UCS2-H,UniGB-UCS2-H,UniCNS-UCS2-H,UniKS-UCS2-H").split(",")
+    if name.strip()
+]
+WARMUP_UNICODE_MAPS = ("Adobe-Japan1", "Adobe-GB1", "Adobe-CNS1", "Adobe-Korea1")
+
+# A one-page, 2x2 ruled table in Helvetica (see bench/pdfgen.py).
+SAMPLE_PDF = (
+    b'%PDF-1.4\n'
+    b'1 0 obj\n'
+    b'<< /Type /Catalog /Pages 2 0 R >>\n'
+    b'endobj\n'
+    b'2 0 obj\n'
+    b'<< /Type /Pages /Kids [4 0 R] /Count 1 >>\n'
+    b'endobj\n'
+    b'3 0 obj\n'
+    b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>\n'
+    b'endobj\n'
+    b'4 0 obj\n'
+    b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents 5 0 R >>\n'
+    b'endobj\n'
+    b'5 0 obj\n'
+    b'<< /Length 340 >>\n'
+    b'stream\n'
+    b'36.0 756.0 m 576.0 756.0 l S\n'
+    b'36.0 742.0 m 576.0 742.0 l S\n'
+    b'36.0 728.0 m 576.0 728.0 l S\n'
+    b'36.0 756.0 m 36.0 728.0 l S\n'
+    b'306.0 756.0 m 306.0 728.0 l S\n'
+    b'576.0 756.0 m 576.0 728.0 l S\n'
+    b'BT /F1 7 Tf 38.0 746.0 Td (p0r0c0) Tj ET\n'
+    b'BT /F1 7 Tf 308.0 746.0 Td (p0r0c1) Tj ET\n'
+    b'BT /F1 7 Tf 38.0 732.0 Td (p0r1c0) Tj ET\n'
+    b'BT /F1 7 Tf 308.0 732.0 Td (p0r1c1) Tj ET\n'
+    b'endstream\n'
+    b'endobj\n'
+    b'xref\n'
+    b'0 6\n'
+    b'0000000000 65535 f \n'
+    b'0000000009 00000 n \n'
+    b'0000000058 00000 n \n'
+    b'0000000115 00000 n \n'
+    b'0000000212 00000 n \n'
+    b'0000000338 00000 n \n'
+    b'trailer\n'
+    b'<< /Size 6 /Root 1 0 R >>\n'
+    b'startxref\n'
+    b'729\n'
+    b'%%EOF\n'
+)
+
+state = {"ready": False, "error": None, "seconds": None}
+_lock = threading.Lock()
+
+
+def _load_pdfminer():
+    # Importing these pulls in the standard 14 font metrics and the parser
+    # tables that pdfplumber otherwise loads on the first request.
+    import pdfminer.fontmetrics  # noqa: F401
+    import pdfminer.pdffont  # noqa: F401
+    import pdfminer.pdfinterp  # noqa: F401
+    import pdfplumber  # noqa: F401
+    from pdfminer.cmapdb import CMapDB
+
+    for name in WARMUP_CMAPS:
+        try:
+            CMapDB.get_cmap(name)
+        except CMapDB.CMapNotFound:
+            pass
+    if WARMUP_CMAPS:
+        for collection in WARMUP_UNICODE_MAPS:
+            for vertical in (False, True):
+                try:
+                    CMapDB.get_unicode_map(collection, vertical)
+                except CMapDB.CMapNotFound:
+                    pass
+
+
+def warm_up():
+    """Load pdfminer's lazy data and run the sample PDF end to end, once."""
+    with _lock:
+        if state["ready"]:
+            return state
+        start = time.perf_counter()
+        try:
+            _load_pdfminer()
+            # In-process even with EXTRACT_PAGE_TIMEOUT: under preload_app
+            # this runs in the master, which must not start page runners
+            # for its workers to inherit.
+            rows = extract_tables(io.BytesIO(SAMPLE_PDF), workers=1, page_timeout=0)
+            if len(rows) != 2:
+                raise RuntimeError(f"warm-up extraction returned {len(rows)} rows, expected 2")
+        except Exception as e:
+            state["error"] = str(e) or e.__class__.__name__
+        else:
+            state["ready"] = True
+            state["error"] = None
+        state["seconds"] = round(time.perf_counter() - start, 3)
+    return state
+
+
+def start():
+    if WARMUP == "off":
+        state["ready"] = True
+    elif WARMUP == "background":
+        threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+    else:
+        warm_up()
+
+
+def warm_worker():
+    # Called in each gunicorn worker after fork: the extraction pool cannot
+    # be inherited, so start (and warm) its processes before taking traffic.
+    # A background warm-up thread does not survive the fork either.
+    if not state["ready"]:
+        start()
+    if EXTRACT_WORKERS > 1:
+        get_pool()
+    if EXTRACT_PAGE_TIMEOUT > 0:
+        prestart_runner()